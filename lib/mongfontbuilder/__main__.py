@@ -1,30 +1,40 @@
 """
-uv run python -m mongfontbuilder input_ufo output [--locales ...]
+uv run python -m mongfontbuilder input_ufo output [output ...] [--locales ...]
+uv run python -m mongfontbuilder input_otf output_otf [--locales ...]
 """
 
 from argparse import ArgumentParser
 from os import environ
 from pathlib import Path
 
-from ufo2ft import OTFCompiler
-from ufo2ft.constants import CFFOptimization
+from fontTools.ttLib import TTFont
+from ufo2ft.util import makeOfficialGlyphOrder
 from ufoLib2 import Font
 
 from . import data
+from .binary import applySpecToBinary, readBinaryInventory
 from .data.types import LocaleID
+from .lookupcache import LookupCache
 from .otl import MongFeaComposer
-from .spec import applySpecToFont
+from .otl.cache import loadComposition, saveComposition
+from .otl.graph import LookupGraph
+from .otl.ordering import compareGlyphOrders
+from .otl.pruning import prune
+from .pipeline import writeOutputs
+from .spec import applySpecToFont, readGlyphInventory
 
 parser = ArgumentParser()
 parser.add_argument(
     "input",
     type=Path,
-    help="path to read source UFO font from",
+    help="path to read source UFO font from, or a compiled font (.otf or .ttf) to patch",
 )
 parser.add_argument(
-    "output",
+    "outputs",
+    metavar="output",
     type=Path,
-    help="path to write constructed font to (.ufo or .otf)",
+    nargs="+",
+    help="paths to write constructed font to (.ufo or .otf), from one composition",
 )
 parser.add_argument(
     "--locales",
@@ -34,44 +44,113 @@ parser.add_argument(
     required=True,
     help="targeted locales, one or more from: " + ", ".join(data.locales),
 )
+parser.add_argument(
+    "--prune",
+    action="store_true",
+    help="drop rules and classes involving glyphs missing from the font, for partial fonts",
+)
+parser.add_argument(
+    "--lookup-graph",
+    metavar="PATH",
+    type=Path,
+    help="path to write the lookup dependency graph to (.dot or .json)",
+)
+parser.add_argument(
+    "--composition-cache",
+    metavar="DIR",
+    type=Path,
+    help="directory to cache composition results in, reused when only outlines changed",
+)
+parser.add_argument(
+    "--lookup-cache",
+    metavar="PATH",
+    type=Path,
+    help="file to cache compiled lookups in (.json), reused for lookups unchanged along with "
+    "the glyph order",
+)
+parser.add_argument(
+    "--compact-gender-harmony",
+    action="store_true",
+    help="compose Hudum gender harmony with fewer lookups and inserted glyphs",
+)
+parser.add_argument(
+    "--optimize-glyph-order",
+    action="store_true",
+    help="group glyph classes in the glyph order for compact coverage tables, and report savings",
+)
 
 args = parser.parse_args()
 input: Path = args.input
-output: Path = args.output
+outputs: list[Path] = args.outputs
 locales: list[LocaleID] = args.locales
+compact: bool = args.compact_gender_harmony
 
-font = Font.open(input)
+lookupCache = LookupCache(args.lookup_cache) if args.lookup_cache else None
 
-c = MongFeaComposer(
-    cmap={j: i for i in font.keys() for j in font[i].unicodes},
-    glyphs=[*font.keys()],
-    locales=locales,
-)
-spec = c.compose()
-
-applySpecToFont(spec, font)
-fea = c.asFeatureFile().asFea()
-# Workaround: remove duplicate substitution in MCHx masculine_onset
-lines = fea.split("\n")
-lines = [
-    l for i, l in enumerate(lines) if not (i == 626 and "sub @MCHx-g.medi by u1864.Hh2.medi" in l)
-]
-font.features.text = "\n".join(lines)
+binarySuffixes = [".otf", ".ttf"]
+binary = input.suffix.lower() in binarySuffixes
+if binary:
+    if args.optimize_glyph_order:
+        parser.error("--optimize-glyph-order requires a UFO input")
+    ttFont = TTFont(input)
+    # Outlines are patched, not converted:
+    outlines, suffix = ("TrueType", ".ttf") if "glyf" in ttFont else ("CFF", ".otf")
+    if any(i.suffix.lower() != suffix for i in outputs):
+        parser.error(f"{input.name} has {outlines} outlines, so outputs must be {suffix} fonts")
+    cmap, glyphs = readBinaryInventory(ttFont)
+else:
+    cmap, glyphs = readGlyphInventory(input)
+# Reports and options below need the composer itself, not only its results:
+cacheable = not (args.prune or args.lookup_graph or args.optimize_glyph_order)
+cacheDir: Path | None = args.composition_cache
+if cacheDir and cacheable and (
+    cached := loadComposition(cacheDir, cmap, glyphs, locales, compact)
+):
+    spec, fea = cached
+    print("Reusing cached composition")
+else:
+    c = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=locales, compactGenderHarmony=compact)
+    spec = c.compose()
+    if c.ligatureReport:
+        print(c.ligatureReport)
+    for locale, (before, after) in c.particleRuleCounts.items():
+        print(f"Particle rules ({locale}): {before} -> {after}")
+    for size in c.oversizedLookups:
+        print(f"Extension lookup for overflow risk: {size}")
+    if args.prune:
+        print(prune(c))
+    if args.lookup_graph:
+        graph = LookupGraph.fromStatements(c.root)
+        graphPath: Path = args.lookup_graph
+        graphPath.write_text(graph.asJson() if graphPath.suffix == ".json" else graph.asDot())
+    fea = c.asFeatureFile().asFea()
+    if cacheDir and cacheable:
+        saveComposition(cacheDir, cmap, glyphs, locales, spec, fea, compact)
 
-output.parent.mkdir(parents=True, exist_ok=True)
+if binary:
+    # Only patch layout tables and new glyphs, without compiling outlines again:
+    environ["FONTTOOLS_LOOKUP_DEBUGGING"] = "1"  # For feaLib.builder.Builder
+    applySpecToBinary(spec, ttFont, fea, lookupCache=lookupCache)
+    for output in outputs:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        ttFont.save(output)
+else:
+    font = Font.open(input)
+    applySpecToFont(spec, font, lazy=True)
+    font.features.text = fea
+    if args.optimize_glyph_order:
+        glyphOrder, report = compareGlyphOrders(
+            c,
+            makeOfficialGlyphOrder(font),
+            font.lib["public.openTypeCategories"],
+            font.features.text,
+        )
+        font.glyphOrder = glyphOrder
+        print(report)
+    writeOutputs(font, outputs, featureWriters=[], lookupCache=lookupCache)
 
-suffix = output.suffix.lower()
-if suffix == ".ufo":
-    font.save(output, overwrite=True)
-elif suffix == ".otf":
-    environ["FONTTOOLS_LOOKUP_DEBUGGING"] = "1"
-    compiler = OTFCompiler(
-        useProductionNames=False,
-        optimizeCFF=CFFOptimization.NONE,
-        featureWriters=[],
-    )
-    compiler.compile(font).save(output)
+if lookupCache:
+    lookupCache.save()
+    print(f"Lookup cache: {lookupCache}")
+for output in outputs:
     print(f"Generated: {output}")
-else:
-    msg = f"unsupported output format: {suffix} (use .ufo or .otf)"
-    raise ValueError(msg)
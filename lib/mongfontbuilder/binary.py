@@ -0,0 +1,191 @@
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.misc.arrayTools import offsetRect, unionRect
+from fontTools.pens.boundsPen import BoundsPen
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.transformPen import TransformPen
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import otTables
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphComponent
+
+from .lookupcache import LookupCache, addOpenTypeFeaturesCached
+from .spec import FontSpec
+
+glyphClassDefCategories = ["base", "ligature", "mark", "component"]
+"""Categories in the order of GDEF glyph classes 1 to 4."""
+
+
+def readBinaryInventory(font: TTFont) -> tuple[dict[int, str], list[str]]:
+    """
+    Read the cmap and glyph names of a compiled font, as taken by `MongFeaComposer`. The font needs meaningful glyph names, i.e., CFF outlines or a format 2 `post` table.
+    """
+
+    return {**font.getBestCmap()}, font.getGlyphOrder()
+
+
+def applySpecToBinary(
+    spec: FontSpec,
+    font: TTFont,
+    fea: str,
+    initPadding: float = 40,
+    finaPadding: float = 100,
+    lookupCache: LookupCache | None = None,
+) -> None:
+    """
+    Counterpart of `applySpecToFont` for a compiled font, patching it in place instead of compiling outlines again.
+
+    New glyphs are added to `hmtx` and to `CFF ` or `glyf`, built from their components like in `applySpecToFont`. GSUB and GDEF are rebuilt from *fea* and the glyph classes from the existing GDEF and the spec. Other tables, e.g. GPOS, are kept as is, together with the GDEF sub-tables they may use. With *lookupCache*, lookups compiled before are reused.
+    """
+
+    font.ensureDecompiled()  # With the original glyph order
+    glyphOrder = font.getGlyphOrder()
+    newGlyphs = {k: v for k, v in spec.newGlyphs.items() if k not in glyphOrder}
+    font.setGlyphOrder([*glyphOrder, *newGlyphs])
+
+    hmtx = font["hmtx"]
+    glyphSet = font.getGlyphSet()
+    bounds = dict[str, tuple[float, float, float, float] | None]()
+    for name, glyphSpec in newGlyphs.items():
+        width = initPadding if glyphSpec.initPadding else 0
+        offsets = list[float]()
+        for baseGlyph in glyphSpec.components:
+            offsets.append(width)
+            width += hmtx[baseGlyph][0]
+        if glyphSpec.finaPadding:
+            width += finaPadding
+        width = round(width)
+
+        if "CFF " in font:
+            _addCharString(font, name, width, [*zip(glyphSpec.components, offsets)])
+        else:
+            _addCompositeGlyph(font, name, [*zip(glyphSpec.components, offsets)])
+        # Union of shifted component bounds, instead of drawing the new glyph:
+        box = None
+        for baseGlyph, offset in zip(glyphSpec.components, offsets):
+            if componentBox := _getBounds(glyphSet, baseGlyph, bounds):
+                shifted = offsetRect(componentBox, offset, 0)
+                box = unionRect(box, shifted) if box else shifted
+        bounds[name] = box
+        hmtx[name] = width, round(box[0]) if box else 0
+        if "vmtx" in font:
+            vmtx = font["vmtx"]
+            vmtx[name] = vmtx[glyphSpec.components[0]] if glyphSpec.components else (0, 0)
+
+    for table in font["cmap"].tables:
+        if table.isUnicode() and table.format != 14:
+            for codePoint, glyphName in spec.cmap.items():
+                if codePoint <= 0xFFFF or table.format in [12, 13]:
+                    table.cmap[codePoint] = glyphName
+
+    existingGDEF = font["GDEF"].table if "GDEF" in font else None
+    categories = dict[str, str]()
+    if existingGDEF and (classDef := existingGDEF.GlyphClassDef):
+        for name, glyphClass in classDef.classDefs.items():
+            categories[name] = glyphClassDefCategories[glyphClass - 1]
+    categories.update(spec.openTypeCategories)
+
+    for tag in ["GSUB", "GDEF"]:
+        if tag in font:
+            del font[tag]
+    fea += glyphClassDefFea(categories, font.getGlyphOrder())
+    if lookupCache is None:
+        addOpenTypeFeaturesFromString(font, fea, tables=["GSUB", "GDEF"])
+    else:
+        addOpenTypeFeaturesCached(font, fea, lookupCache, tables=["GSUB", "GDEF"])
+    if existingGDEF:
+        _mergeGDEF(font, existingGDEF)
+
+
+def _mergeGDEF(font: TTFont, existing: otTables.GDEF) -> None:
+    """
+    Carry the sub-tables of *existing* that other tables of *font*, e.g. GPOS, may refer to over to the GDEF just built for its GSUB. Mark glyph sets of *existing* keep their indices and the ones built for GSUB are appended to them. Attachment points, ligature carets and the variation store are taken from *existing* unless built as well. Mark attachment classes cannot be renumbered, so they must not conflict.
+    """
+
+    gdef = font["GDEF"].table
+    for name in ["AttachList", "LigCaretList"]:
+        if getattr(gdef, name, None) is None:
+            setattr(gdef, name, getattr(existing, name, None))
+    if existingClassDef := getattr(existing, "MarkAttachClassDef", None):
+        classDef = getattr(gdef, "MarkAttachClassDef", None)
+        if classDef and classDef.classDefs != existingClassDef.classDefs:
+            raise ValueError("mark attachment classes conflict with the existing GDEF")
+        gdef.MarkAttachClassDef = existingClassDef
+
+    existingSets = getattr(existing, "MarkGlyphSetsDef", None)
+    if existingSets and existingSets.Coverage:
+        builtSets = getattr(gdef, "MarkGlyphSetsDef", None)
+        if builtSets and "GSUB" in font:
+            for lookup in font["GSUB"].table.LookupList.Lookup:
+                if lookup.LookupFlag & 0x0010:  # USE_MARK_FILTERING_SET
+                    lookup.MarkFilteringSet += len(existingSets.Coverage)
+        sets = gdef.MarkGlyphSetsDef = otTables.MarkGlyphSetsDef()
+        sets.MarkSetTableFormat = 1
+        sets.Coverage = [*existingSets.Coverage, *(builtSets.Coverage if builtSets else [])]
+        sets.MarkSetCount = len(sets.Coverage)
+    if getattr(existing, "VarStore", None) and getattr(gdef, "VarStore", None) is None:
+        gdef.VarStore = existing.VarStore
+
+    if getattr(gdef, "VarStore", None):
+        gdef.Version = 0x00010003
+    elif getattr(gdef, "MarkGlyphSetsDef", None):
+        gdef.Version = max(gdef.Version, 0x00010002)
+
+
+def glyphClassDefFea(openTypeCategories: dict[str, str], glyphOrder: list[str]) -> str:
+    """
+    >>> glyphClassDefFea({"a": "base", "b": "mark", "c": "unassigned"}, ["a", "b", "c"])
+    '\\ntable GDEF {\\n  GlyphClassDef [a], [], [b], [];\\n} GDEF;\\n'
+    """
+
+    glyphs = {*glyphOrder}
+    classes = {i: list[str]() for i in glyphClassDefCategories}
+    for name, category in openTypeCategories.items():
+        if category in classes and name in glyphs:
+            classes[category].append(name)
+    glyphClassDef = ", ".join("[" + " ".join(i) + "]" for i in classes.values())
+    return f"\ntable GDEF {{\n  GlyphClassDef {glyphClassDef};\n}} GDEF;\n"
+
+
+def _getBounds(glyphSet, name: str, bounds: dict) -> tuple[float, float, float, float] | None:
+    if name not in bounds:
+        pen = BoundsPen(glyphSet)
+        glyphSet[name].draw(pen)
+        bounds[name] = pen.bounds
+    return bounds[name]
+
+
+def _addCharString(
+    font: TTFont,
+    name: str,
+    width: int,
+    components: list[tuple[str, float]],
+) -> None:
+    topDict = font["CFF "].cff.topDictIndex[0]
+    charStrings = topDict.CharStrings
+    private = topDict.Private
+    glyphSet = font.getGlyphSet()
+
+    pen = T2CharStringPen(
+        None if width == private.defaultWidthX else width - private.nominalWidthX, glyphSet
+    )
+    for baseGlyph, offset in components:
+        glyphSet[baseGlyph].draw(TransformPen(pen, (1, 0, 0, 1, offset, 0)))
+    charString = pen.getCharString(private, topDict.GlobalSubrs)
+
+    charStrings.charStringsIndex.append(charString)
+    charStrings.charStrings[name] = len(charStrings.charStringsIndex) - 1
+    topDict.charset.append(name)
+
+
+def _addCompositeGlyph(font: TTFont, name: str, components: list[tuple[str, float]]) -> None:
+    glyph = Glyph()
+    if components:
+        glyph.numberOfContours = -1
+        glyph.components = []
+        for baseGlyph, offset in components:
+            component = GlyphComponent()
+            component.glyphName, component.x, component.y = baseGlyph, round(offset), 0
+            component.flags = 0x4  # ROUND_XY_TO_GRID
+            glyph.components.append(component)
+    else:
+        glyph.numberOfContours = 0
+    font["glyf"][name] = glyph
@@ -0,0 +1,253 @@
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cache
+from typing import cast, get_args
+
+from fontTools import unicodedata
+
+from . import aliases as dataAliases
+from . import locales as dataLocales
+from . import variants as dataVariants
+from .types import (
+    FVS,
+    AliasData,
+    CharacterName,
+    Condition,
+    JoiningPosition,
+    LocaleData,
+    LocaleID,
+    LocaleNamespace,
+    VariantData,
+    joiningPositions,
+)
+
+locales: list[LocaleID] = [*get_args(LocaleID)]
+_localeIDs = {k: i for i, k in enumerate(locales)}
+namespaces: list[LocaleNamespace] = [*get_args(LocaleNamespace)]
+
+
+@dataclass
+class VariantTable:
+    """
+    Columnar form of the variant data, with one row per variant in data order, i.e., by character, position and FVS. Characters, positions, FVSes, locales and conditions are interned as integer IDs, and locale membership, conditions, `lvs` and `archaic` are bitmasks, so that queries are filters over flat arrays instead of walks over nested dicts.
+
+    >>> table = variantTable()
+    >>> rows = table.select(character="MONGOLIAN LETTER A", position="init", locales="MNG")
+    >>> [table.fvs[i] for i in rows]
+    [1, 2]
+    >>> rows = table.select(locales="MNG", condition="chachlag", position="isol")
+    >>> sorted({table.charName(i) for i in rows})
+    ['MONGOLIAN LETTER A', 'MONGOLIAN LETTER E']
+    """
+
+    characters: list[CharacterName]
+    """Character ID -> character name."""
+    conditions: list[Condition]
+    """Condition ID -> condition, as bit indices in `conditionMasks`."""
+
+    character: array
+    position: array
+    """Index in `joiningPositions`."""
+    fvs: array
+    default: array
+    localeMask: array
+    """Bit *i* for locale `locales[i]`."""
+    lvsMask: array
+    archaicMask: array
+    conditionMasks: list[array]
+    """Locale ID -> condition bitmask of each row for that locale."""
+    variants: list[VariantData]
+
+    characterRows: dict[CharacterName, range]
+    """Rows of each character, which are contiguous."""
+    characterPositions: dict[CharacterName, list[JoiningPosition]]
+    """Positions of each character in data order, including those without variants."""
+
+    @classmethod
+    def fromVariants(
+        cls,
+        variants: dict[CharacterName, dict[JoiningPosition, dict[FVS, VariantData]]],
+    ) -> "VariantTable":
+        conditions = sorted(
+            {
+                condition
+                for positionToFVSToVariant in variants.values()
+                for fvsToVariant in positionToFVSToVariant.values()
+                for variant in fvsToVariant.values()
+                for localeData in variant.locales.values()
+                for condition in localeData.conditions
+            }
+        )
+        assert len(conditions) <= 64, conditions
+        conditionBits = {k: 1 << i for i, k in enumerate(conditions)}
+        localeBits = {k: 1 << i for k, i in _localeIDs.items()}
+
+        table = cls(
+            characters=[*variants],
+            conditions=conditions,
+            character=array("H"),
+            position=array("B"),
+            fvs=array("B"),
+            default=array("B"),
+            localeMask=array("L"),
+            lvsMask=array("L"),
+            archaicMask=array("L"),
+            conditionMasks=[array("Q") for _ in locales],
+            variants=[],
+            characterRows={},
+            characterPositions={},
+        )
+        for characterID, (charName, positionToFVSToVariant) in enumerate(variants.items()):
+            start = len(table.variants)
+            for position, fvsToVariant in positionToFVSToVariant.items():
+                for fvs, variant in fvsToVariant.items():
+                    table.character.append(characterID)
+                    table.position.append(joiningPositions.index(position))
+                    table.fvs.append(fvs)
+                    table.default.append(variant.default)
+                    localeMask = lvsMask = archaicMask = 0
+                    for locale, localeData in variant.locales.items():
+                        localeMask |= localeBits[locale]
+                        if localeData.lvs:
+                            lvsMask |= localeBits[locale]
+                        if localeData.archaic:
+                            archaicMask |= localeBits[locale]
+                    table.localeMask.append(localeMask)
+                    table.lvsMask.append(lvsMask)
+                    table.archaicMask.append(archaicMask)
+                    for locale, conditionMask in zip(locales, table.conditionMasks):
+                        localeData = variant.locales.get(locale)
+                        conditionMask.append(
+                            sum(conditionBits[i] for i in localeData.conditions)
+                            if localeData
+                            else 0
+                        )
+                    table.variants.append(variant)
+            table.characterRows[charName] = range(start, len(table.variants))
+            table.characterPositions[charName] = [*positionToFVSToVariant]
+        return table
+
+    def select(
+        self,
+        *,
+        character: CharacterName | None = None,
+        position: JoiningPosition | None = None,
+        locales: LocaleID | Iterable[LocaleID] | None = None,
+        condition: Condition | None = None,
+        lvs: bool = False,
+    ) -> list[int]:
+        """
+        Rows in data order, of *character* at *position*, in any of *locales*, and with *condition* or `lvs` in any of these locales.
+        """
+
+        rows: Iterable[int] = (
+            range(len(self.variants)) if character is None else self.characterRows[character]
+        )
+        if position is not None:
+            positionID = joiningPositions.index(position)
+            column = self.position
+            rows = [i for i in rows if column[i] == positionID]
+        if locales is not None:
+            locales = [locales] if isinstance(locales, str) else [*locales]
+            mask = _localeMask(locales)
+            column = self.lvsMask if lvs else self.localeMask
+            rows = [i for i in rows if column[i] & mask]
+            if condition is not None:
+                if condition not in self.conditions:
+                    return []
+                bit = 1 << self.conditions.index(condition)
+                columns = [self.conditionMasks[_localeIDs[i]] for i in locales]
+                rows = [i for i in rows if any(column[i] & bit for column in columns)]
+        else:
+            assert condition is None and not lvs
+        return [*rows]
+
+    def hasLvs(self, row: int, locale: LocaleID) -> bool:
+        return bool(self.lvsMask[row] >> _localeIDs[locale] & 1)
+
+    def rowConditions(self, row: int, locale: LocaleID) -> list[Condition]:
+        mask = self.conditionMasks[_localeIDs[locale]][row]
+        return [k for i, k in enumerate(self.conditions) if mask >> i & 1]
+
+    def charName(self, row: int) -> CharacterName:
+        return self.characters[self.character[row]]
+
+    def joiningPosition(self, row: int) -> JoiningPosition:
+        return joiningPositions[self.position[row]]
+
+
+@cache
+def variantTable() -> VariantTable:
+    """Table of `mongfontbuilder.data.variants`, built once until `variantTable.cache_clear()`."""
+
+    return VariantTable.fromVariants(dataVariants)
+
+
+def _localeMask(locales: Iterable[LocaleID]) -> int:
+    return sum(1 << _localeIDs[i] for i in {*locales})
+
+
+@dataclass
+class AliasTable:
+    """
+    Aliases of code points, interned as integer IDs, with the categories of each locale as bitmasks over alias IDs, so that checking the alias or category of a code point is a read from a flat array and a bit test.
+
+    >>> table = aliasTable()
+    >>> table.alias(0x1820, "MNG"), table.inCategory(0x1820, "MNG", "vowel")
+    ('a', True)
+    >>> table.alias(0x1828, "SIB"), table.inCategory(0x1828, "SIB", "vowel")
+    ('n', False)
+    """
+
+    aliases: list[str]
+    """Alias ID -> alias."""
+    aliasIDs: dict[LocaleNamespace, array]
+    """Code point -> alias ID in the namespace, or -1 for none."""
+    categoryMasks: dict[LocaleID, dict[str, int]]
+    """Category -> bit *i* for alias `aliases[i]`, in the namespace of the locale."""
+
+    @classmethod
+    def fromData(
+        cls,
+        aliases: dict[CharacterName, AliasData],
+        localeToData: dict[LocaleID, LocaleData],
+    ) -> "AliasTable":
+        codePointToAliases = {ord(unicodedata.lookup(k)): v for k, v in aliases.items()}
+        size = max(codePointToAliases) + 1
+        table = cls(aliases=[], aliasIDs={}, categoryMasks={})
+        ids = dict[str, int]()
+        for namespace in namespaces:
+            column = table.aliasIDs[namespace] = array("h", [-1]) * size
+            for codePoint, alias in codePointToAliases.items():
+                alias = alias if isinstance(alias, str) else alias.get(namespace)
+                if alias:
+                    if alias not in ids:
+                        ids[alias] = len(table.aliases)
+                        table.aliases.append(alias)
+                    column[codePoint] = ids[alias]
+        for locale, localeData in localeToData.items():
+            table.categoryMasks[locale] = {
+                category: sum(1 << ids[i] for i in {*members})
+                for category, members in localeData.categories.items()
+            }
+        return table
+
+    def aliasID(self, codePoint: int, namespace: LocaleNamespace) -> int:
+        column = self.aliasIDs[namespace]
+        return column[codePoint] if codePoint < len(column) else -1
+
+    def alias(self, codePoint: int, namespace: LocaleNamespace) -> str | None:
+        aliasID = self.aliasID(codePoint, namespace)
+        return self.aliases[aliasID] if aliasID >= 0 else None
+
+    def inCategory(self, codePoint: int, locale: LocaleID, category: str) -> bool:
+        aliasID = self.aliasID(codePoint, cast(LocaleNamespace, locale.removesuffix("x")))
+        return aliasID >= 0 and bool(self.categoryMasks[locale][category] >> aliasID & 1)
+
+
+@cache
+def aliasTable() -> AliasTable:
+    """Table of `mongfontbuilder.data.aliases` and `mongfontbuilder.data.locales`, built once."""
+
+    return AliasTable.fromData(dataAliases, dataLocales)
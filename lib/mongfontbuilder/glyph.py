@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-import re
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from copy import deepcopy
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 from fontTools import unicodedata
 
@@ -19,18 +19,35 @@ from .data import (
 from .data.logic import variantFromReference
 from .data.types import VariantReference, fina, init, isol, joiningPositions, medi
 
+_writtenUnitSet = frozenset(writtenUnits)
+_joiningPositionSet = frozenset(joiningPositions)
+
 
 def splitWrittens(writtens: str) -> list[WrittenUnitID]:
     """
+    Split written units before each capital letter.
+
     >>> splitWrittens("ABbCcc")
     ['A', 'Bb', 'Ccc']
     """
 
     if isinstance(writtens, str):
-        return re.sub(r"[A-Z]", lambda x: " " + x[0], writtens).removeprefix(" ").split(" ")
+        return [*_splitWrittens(writtens)]
     return list(writtens)
 
 
+@lru_cache(maxsize=1 << 12)
+def _splitWrittens(writtens: str) -> tuple[WrittenUnitID, ...]:
+    units = list[WrittenUnitID]()
+    start = 0
+    for index, char in enumerate(writtens):
+        if index and "A" <= char <= "Z":
+            units.append(writtens[start:index])
+            start = index
+    units.append(writtens[start:])
+    return tuple(units)
+
+
 def getPosition(index: int, length: int) -> JoiningPosition:
     return isol if length == 1 else (init if index == 0 else fina if index == length - 1 else medi)
 
@@ -80,30 +97,44 @@ class GlyphDescriptor:
     suffixes: list[str] = field(default_factory=list)
 
     @classmethod
-    def parse(cls, name: str) -> GlyphDescriptor:
+    def parse(cls, name: str, *, trusted: bool = False) -> GlyphDescriptor:
         """
+        Parse a glyph name, raising `ValueError` if it is invalid. Results and failures are cached by name, so repeated parsing is cheap. With *trusted*, e.g. for names formatted by this class, the name is not checked to round-trip.
+
         >>> GlyphDescriptor.parse('u1820.A.init')
         GlyphDescriptor(codePoints=[6176], units=['A'], position='init', suffixes=[])
         >>> GlyphDescriptor.parse('_A.init')
         GlyphDescriptor(codePoints=[], units=['A'], position='init', suffixes=[])
+        >>> GlyphDescriptor.parse('u1820.A.middle')
+        Traceback (most recent call last):
+        ValueError: invalid glyph name: 'u1820.A.middle'
         """
 
-        x, y, position, *suffixes = (
-            "." + name.removeprefix("_")  # _A.init
-            if name.startswith("_")
-            else name  # u1820.A.init
-        ).split(".")
-        units = splitWrittens(y)
-        assert units and all(i in writtenUnits for i in units), name
-        assert position in joiningPositions, name
-        instance = cls(
-            codePoints=[int(i.removeprefix("u"), 16) for i in x.split("_")] if x else [],
-            units=units,
-            position=position,
-            suffixes=suffixes,
-        )
-        assert str(instance) == name
-        return instance
+        parsed = _parseGlyphName(name, not trusted)
+        if parsed is None:
+            raise ValueError(f"invalid glyph name: {name!r}")
+        codePoints, units, position, suffixes = parsed
+        # Fresh lists, as instances are mutable:
+        return cls([*codePoints], [*units], position, [*suffixes])  # type: ignore
+
+    @classmethod
+    def parseMany(cls, names: Iterable[str]) -> tuple[list[GlyphDescriptor], list[str]]:
+        """
+        Parse *names*, returning descriptors of valid glyph names and, separately, the names that failed to parse.
+
+        >>> descriptors, failures = GlyphDescriptor.parseMany(['u1820.A.init', '.notdef', 'nnbsp'])
+        >>> [str(i) for i in descriptors], failures
+        (['u1820.A.init'], ['.notdef', 'nnbsp'])
+        """
+
+        descriptors = list[GlyphDescriptor]()
+        failures = list[str]()
+        for name in names:
+            try:
+                descriptors.append(cls.parse(name))
+            except ValueError:
+                failures.append(name)
+        return descriptors, failures
 
     @classmethod
     def fromData(
@@ -160,6 +191,32 @@ class GlyphDescriptor:
         return hash(self.__str__())
 
 
+@lru_cache(maxsize=1 << 14)
+def _parseGlyphName(
+    name: str, roundTrip: bool
+) -> tuple[tuple[int, ...], tuple[WrittenUnitID, ...], str, tuple[str, ...]] | None:
+    # None for invalid names, so that failures are cached as well:
+    if name.startswith("_"):
+        fields = ("." + name[1:]).split(".")  # _A.init
+    else:
+        fields = name.split(".")  # u1820.A.init
+    if len(fields) < 3:
+        return None
+    x, y, position, *suffixes = fields
+    units = _splitWrittens(y)
+    if not y or not _writtenUnitSet.issuperset(units) or position not in _joiningPositionSet:
+        return None
+    try:
+        codePoints = tuple(int(i.removeprefix("u"), 16) for i in x.split("_")) if x else ()
+    except ValueError:
+        return None
+    if roundTrip:
+        instance = GlyphDescriptor([*codePoints], [*units], position, suffixes)  # type: ignore
+        if str(instance) != name:
+            return None
+    return codePoints, units, position, tuple(suffixes)
+
+
 def uNameFromCodePoint(codePoint: int) -> str:
     return f"u{codePoint:04X}"
 
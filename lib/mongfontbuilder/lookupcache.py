@@ -0,0 +1,142 @@
+"""
+Lookup-level compile cache for feaLib.
+
+feaLib rebuilds every lookup of a feature file, even if a data change only touches a few of them. `CachingBuilder` fingerprints each lookup, i.e., its rules, flags, mark filtering set, glyph classes as resolved glyph names and the indices of lookups it references, together with the glyph order, and reuses the otTables lookup compiled for the same fingerprint before.
+
+Lookups are hooked in feaLib’s `Builder.buildLookups_`, which is not public API, so fontTools is pinned to the versions this is tested with in pyproject.toml.
+"""
+
+import json
+from base64 import b64decode, b64encode
+from hashlib import sha256
+from io import StringIO
+from pathlib import Path
+
+from fontTools.feaLib.builder import Builder
+from fontTools.feaLib.error import FeatureLibError
+from fontTools.otlLib.builder import LookupBuilder
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import otTables
+from fontTools.ttLib.tables.otBase import OTLOffsetOverflowError, OTTableReader, OTTableWriter
+from ufo2ft.featureCompiler import FeatureCompiler
+
+
+class LookupCache:
+    """
+    Compiled lookups by fingerprint, as binary lookup tables persisted in the JSON file at *path*. Without *path*, lookups are only kept in memory.
+    """
+
+    path: Path | None
+    lookups: dict[str, bytes]
+    hits: int
+    misses: int
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self.lookups = {}
+        self.hits = self.misses = 0
+        if path and path.exists():
+            self.lookups = {k: b64decode(v) for k, v in json.loads(path.read_text()).items()}
+
+    def __str__(self) -> str:
+        return f"lookups reused: {self.hits}, compiled: {self.misses}"
+
+    def save(self) -> None:
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            lookups = {k: b64encode(v).decode() for k, v in self.lookups.items()}
+            self.path.write_text(json.dumps(lookups))
+
+
+class CachingBuilder(Builder):
+    cache: LookupCache
+
+    def __init__(self, font: TTFont, featurefile, cache: LookupCache) -> None:
+        super().__init__(font, featurefile)
+        self.cache = cache
+
+    def buildLookups_(self, tag):
+        glyphOrder = sha256("\n".join(self.font.getGlyphOrder()).encode()).hexdigest()
+        for lookup in self.lookups_:
+            if lookup.table == tag:
+                # Called after all lookup indices are assigned:
+                lookup.build = lambda lookup=lookup, build=lookup.build: self._buildCached(
+                    lookup, build, glyphOrder
+                )
+        return super().buildLookups_(tag)
+
+    def _buildCached(self, lookup: LookupBuilder, build, glyphOrder: str):
+        key = sha256(repr((glyphOrder, _fingerprint(lookup))).encode()).hexdigest()
+        if cached := self.cache.lookups.get(key):
+            self.cache.hits += 1
+            # Decompiled afresh, as compiling GSUB may modify lookups, e.g. for overflows:
+            otLookup = otTables.Lookup()
+            otLookup.decompile(OTTableReader(cached, tableTag=lookup.table), self.font)
+            return otLookup
+        self.cache.misses += 1
+        otLookup = build()
+        writer = OTTableWriter(tableTag=lookup.table)
+        try:
+            otLookup.compile(writer, self.font)
+            self.cache.lookups[key] = writer.getAllData()
+        except OTLOffsetOverflowError:
+            pass  # Left to be split when compiling the table
+        return otLookup
+
+
+def addOpenTypeFeaturesCached(
+    font: TTFont,
+    features: str,
+    cache: LookupCache,
+    filename: str | None = None,
+    tables: list[str] | None = None,
+    debug: bool = False,
+) -> None:
+    """Same as feaLib’s `addOpenTypeFeaturesFromString`, reusing lookups from *cache*."""
+
+    featurefile = StringIO(features)
+    if filename:
+        featurefile.name = filename  # For resolving include()
+    CachingBuilder(font, featurefile, cache).build(tables=tables, debug=debug)
+
+
+def cachingFeatureCompilerClass(cache: LookupCache) -> type[FeatureCompiler]:
+    """Feature compiler for ufo2ft’s `featureCompilerClass`, reusing lookups from *cache*."""
+
+    class CachingFeatureCompiler(FeatureCompiler):
+        def buildTables(self):
+            if not self.features:
+                return
+            # Same as ufo2ft, which resolves includes itself if feature writers ran:
+            path = self.ufo.path if not self.featureWriters else None
+            try:
+                addOpenTypeFeaturesCached(self.ttFont, self.features, cache, filename=path)
+            except FeatureLibError:
+                if path is None:
+                    self._write_temporary_feature_file(self.features)
+                raise
+
+    return CachingFeatureCompiler
+
+
+_excludedAttributes = {"font", "glyphMap", "location", "lookup_index"}
+
+
+def _fingerprint(value, nested: bool = False):
+    if isinstance(value, LookupBuilder):
+        if nested:
+            # Referenced lookups are compiled as indices:
+            return "lookup", value.lookup_index
+        attributes = {k: v for k, v in vars(value).items() if k not in _excludedAttributes}
+        return type(value).__name__, _fingerprint(attributes, True)
+    elif isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    elif isinstance(value, dict):
+        return tuple((_fingerprint(k, True), _fingerprint(v, True)) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return tuple(_fingerprint(i, True) for i in value)
+    elif isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(_fingerprint(i, True)) for i in value))
+    elif hasattr(value, "__dict__"):
+        return type(value).__name__, _fingerprint(vars(value), True)
+    return repr(value)
@@ -1,18 +1,24 @@
 import re
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass, replace
-from typing import cast
+from typing import TYPE_CHECKING, cast
 
 from fontTools import unicodedata
 from fontTools.feaLib import ast
-from tptq.feacomposer import FeaComposer
+from tptq.feacomposer import AnyGlyph, FeaComposer, LanguageSystemDict, LookupFlagDict
 
 from .. import GlyphDescriptor, data, splitWrittens, uNameFromCodePoint, writtenCombinations
 from ..data import codePointToCmapVariant
-from ..data.types import FVS, JoiningPosition, LocaleID, joiningPositions
+from ..data.table import variantTable
+from ..data.types import JoiningPosition, LocaleID, joiningPositions
 from ..spec import FontSpec, GlyphSpec
 from ..utils import getAliasesByLocale, getCharNameByAlias, namespaceFromLocale
 
+if TYPE_CHECKING:
+    from .iib import LigatureReport
+    from .subtables import LookupSize
+
 
 @dataclass
 class MongFeaComposer(FeaComposer):
@@ -20,10 +26,18 @@ class MongFeaComposer(FeaComposer):
     glyphs: list[str]
     locales: list[LocaleID]
     spec: FontSpec
+    compactGenderHarmony: bool
+    """Compose the gender harmony of Hudum with `iii0bCompact` instead of `iii0b`."""
 
     # Internal states:
     classes: dict[str, ast.GlyphClassDefinition]
     conditions: dict[str, ast.LookupBlock]
+    markFilteringSets: dict[frozenset[str], ast.GlyphClassDefinition]
+    oversizedLookups: list["LookupSize"]
+    ligatureGlyphs: list[str]
+    ligatureReport: "LigatureReport | None"
+    particleRuleCounts: dict[LocaleID, tuple[int, int]]
+    """Locale -> numbers of particle rules before and after merging particles."""
 
     def __init__(
         self,
@@ -31,12 +45,14 @@ class MongFeaComposer(FeaComposer):
         cmap: dict[int, str],
         glyphs: list[str],
         locales: list[LocaleID],
+        compactGenderHarmony: bool = False,
     ) -> None:
         self.cmap = cmap
         self.glyphs = glyphs
         for locale in locales:
             assert locale.removesuffix("x") in locales
         self.locales = locales
+        self.compactGenderHarmony = compactGenderHarmony
         self.spec = FontSpec(cmap={}, newGlyphs={}, openTypeCategories={})
 
         # TODO: only support one locale
@@ -45,6 +61,11 @@ class MongFeaComposer(FeaComposer):
 
         self.classes = {}
         self.conditions = {}
+        self.markFilteringSets = {}
+        self.oversizedLookups = []
+        self.ligatureGlyphs = []
+        self.ligatureReport = None
+        self.particleRuleCounts = {}
 
         super().__init__(
             languageSystems={
@@ -54,6 +75,8 @@ class MongFeaComposer(FeaComposer):
 
     def compose(self) -> FontSpec:
         from . import ia, ib, iia, iib, iii
+        from .graph import dropUnreachableLookups
+        from .subtables import splitSubtables
 
         self.constructPredefinedGlyphs()
         self.initControls()
@@ -69,46 +92,101 @@ class MongFeaComposer(FeaComposer):
         iib.compose(self)
         ib.compose(self)
 
+        dropUnreachableLookups(self)
+        self.oversizedLookups = splitSubtables(self)
+
         return self.spec
 
-    def constructPredefinedGlyphs(self) -> None:
-        sources = list[GlyphDescriptor]()
-        for name in self.glyphs:
-            try:
-                source = GlyphDescriptor.parse(name)
-            except:
-                continue
-            sources.append(source)
+    @contextmanager
+    def Lookup(
+        self,
+        name: str = "",
+        *,
+        languageSystems: LanguageSystemDict | None = None,
+        feature: str = "",
+        flags: LookupFlagDict | None = None,
+    ) -> Iterator[ast.LookupBlock]:
+        """
+        Same as `FeaComposer.Lookup`, except that the mark filtering set is interned with `markFilteringSet`.
+        """
 
-        codePointToVariantGlyph = dict[int, str]()
-        targetedLocales = {*self.locales}
-        for charName, positionToFVSToVariant in data.variants.items():
-            variantNames = list[str]()
-            for position, fvsToVariant in positionToFVSToVariant.items():
-                for variant in fvsToVariant.values():
-                    if not targetedLocales.intersection(variant.locales):
-                        continue
-
-                    target = GlyphDescriptor.fromData(
-                        charName, position, variant, locale=self.locale
-                    )
-                    targetName = str(target)
-                    variantNames.append(targetName)
+        if flags and (glyphs := flags.get("UseMarkFilteringSet")):
+            flags = flags | {"UseMarkFilteringSet": self.markFilteringSet(glyphs)}
+        with super().Lookup(
+            name, languageSystems=languageSystems, feature=feature, flags=flags
+        ) as lookup:
+            yield lookup
 
-                    if self.glyphNameProcessor(targetName) in self.glyphs:
-                        continue
+    def markFilteringSet(self, glyphs: AnyGlyph) -> ast.GlyphClassDefinition:
+        """
+        Return the named glyph class for the mark filtering set of *glyphs*, shared by all lookups filtering the same glyphs regardless of how the set is spelled.
 
-                    memberNames: list[str]
-                    writtenTarget = replace(target, codePoints=[], suffixes=[])
-                    memberNames = _findMemberNames(sources, writtenTarget)
+        >>> c = MongFeaComposer(cmap={}, glyphs=[], locales=["MNG"])
+        >>> a = c.markFilteringSet(c.glyphClass(["fvs1", "fvs2"]))
+        >>> b = c.markFilteringSet(c.namedGlyphClass("fvs", ["fvs2", "fvs1"]))
+        >>> a is b, a.asFea()
+        (True, '@markFilteringSet1 = [fvs1 fvs2];')
+        """
 
-                    glyphSpec = GlyphSpec([self.glyphNameProcessor(i) for i in memberNames])
-                    if pseudoPosition := target.pseudoPosition():
-                        glyphSpec.initPadding = pseudoPosition in ["isol", "init"]
-                        glyphSpec.finaPadding = pseudoPosition in ["isol", "fina"]
-                    self.spec.newGlyphs[self.glyphNameProcessor(targetName)] = glyphSpec
+        key = frozenset(_glyphNames(self._normalized(glyphs)))
+        definition = self.markFilteringSets.get(key)
+        if definition is None:
+            if isinstance(glyphs, ast.GlyphClassDefinition):
+                definition = glyphs
+            else:
+                name = f"markFilteringSet{len(self.markFilteringSets) + 1}"
+                if not isinstance(glyphs, ast.GlyphClass):
+                    glyphs = self.glyphClass([glyphs])
+                definition = ast.GlyphClassDefinition(name, glyphs)
+                # Defined at the root, visible to all lookups:
+                self.root.append(definition)
+            self.markFilteringSets[key] = definition
+        return definition
+
+    def usedMarkFilteringSets(self) -> list[ast.GlyphClassDefinition]:
+        """Mark filtering sets used by lookups, each compiled into one GDEF entry."""
+
+        used = dict[int, ast.GlyphClassDefinition]()
+        for statement in self.root:
+            if isinstance(statement, ast.FeatureBlock):
+                lookups = [i for i in statement.statements if isinstance(i, ast.LookupBlock)]
+            elif isinstance(statement, ast.LookupBlock):
+                lookups = [statement]
+            else:
+                continue
+            for lookup in lookups:
+                for i in lookup.statements:
+                    if isinstance(i, ast.LookupFlagStatement) and i.markFilteringSet:
+                        definition = i.markFilteringSet.glyphclass
+                        used.setdefault(id(definition), definition)
+        return [*used.values()]
 
-            if variantNames:
+    def constructPredefinedGlyphs(self) -> None:
+        sources, _ = GlyphDescriptor.parseMany(self.glyphs)
+
+        codePointToVariantGlyph = dict[int, str]()
+        table = variantTable()
+        for charName in table.characters:
+            rows = table.select(character=charName, locales=self.locales)
+            for row in rows:
+                target = GlyphDescriptor.fromData(
+                    charName, table.joiningPosition(row), table.variants[row], locale=self.locale
+                )
+                targetName = str(target)
+                if self.glyphNameProcessor(targetName) in self.glyphs:
+                    continue
+
+                memberNames: list[str]
+                writtenTarget = replace(target, codePoints=[], suffixes=[])
+                memberNames = _findMemberNames(sources, writtenTarget)
+
+                glyphSpec = GlyphSpec([self.glyphNameProcessor(i) for i in memberNames])
+                if pseudoPosition := target.pseudoPosition():
+                    glyphSpec.initPadding = pseudoPosition in ["isol", "init"]
+                    glyphSpec.finaPadding = pseudoPosition in ["isol", "fina"]
+                self.spec.newGlyphs[self.glyphNameProcessor(targetName)] = glyphSpec
+
+            if rows:
                 codePoint = ord(unicodedata.lookup(charName))
                 variant = GlyphDescriptor([codePoint], *codePointToCmapVariant[codePoint])
                 codePointToVariantGlyph[codePoint] = str(variant)
@@ -130,8 +208,8 @@ class MongFeaComposer(FeaComposer):
         """
 
         from .iii import (
+            HARMONY_MARKERS,
             MARKER_FEMININE,
-            MARKER_INITIAL,
             MARKER_MASCULINE,
             MARKER_MASCULINE_FALSE,
             MARKER_MASCULINE_TRUE,
@@ -208,13 +286,15 @@ class MongFeaComposer(FeaComposer):
                 processedName = self.glyphNameProcessor(name)
                 self.spec.newGlyphs[processedName] = GlyphSpec([])
                 self.spec.openTypeCategories[processedName] = "mark"
-            for name in MARKER_MASCULINE_FALSE, MARKER_MASCULINE_TRUE:
+            stateMarkers = (
+                HARMONY_MARKERS
+                if self.compactGenderHarmony
+                else [MARKER_MASCULINE_FALSE, MARKER_MASCULINE_TRUE]
+            )
+            for name in stateMarkers:
                 processedName = self.glyphNameProcessor(name)
                 self.spec.newGlyphs[processedName] = GlyphSpec([])
                 self.spec.openTypeCategories[processedName] = "base"
-            processedName = self.glyphNameProcessor(MARKER_INITIAL)
-            self.spec.newGlyphs[processedName] = GlyphSpec([])
-            self.spec.openTypeCategories[processedName] = "mark"
 
     def initVariants(self) -> None:
         """
@@ -233,49 +313,36 @@ class MongFeaComposer(FeaComposer):
         In addition, GB shaping requirements result in the need to reset the letter to its default variant. Resetting condition -- locale + "-reset", e.g. `MNG-reset`.
         """
 
-        for locale in self.locales:
+        table = variantTable()
+        localeToBuckets = {locale: self.bucketVariants(locale) for locale in self.locales}
+        for locale, buckets in localeToBuckets.items():
+            aliasToCategory = dict[str, str]()
+            for category, aliases in data.locales[locale].categories.items():
+                for alias in aliases:
+                    aliasToCategory.setdefault(alias, category)
+
             categoryToClasses = dict[str, list[ast.GlyphClassDefinition]]()
             for alias in getAliasesByLocale(locale):
                 charName = getCharNameByAlias(locale, alias)
                 letter = locale + "-" + alias
-                category = next(k for k, v in data.locales[locale].categories.items() if alias in v)
+                category = aliasToCategory[alias]
                 genderNeutralCategory = re.sub("[A-Z][a-z]+", "", category)
 
                 positionalClasses = list[ast.GlyphClassDefinition]()
                 lvsPositionalClasses = list[ast.GlyphClassDefinition]()
-                for position, variants in data.variants[charName].items():
-                    positionalClass = self.namedGlyphClass(
-                        letter + "." + position,
-                        [
-                            str(GlyphDescriptor.fromData(charName, position, i, locale=self.locale))
-                            for i in variants.values()
-                            if locale in i.locales
-                        ],
-                    )
-                    self.classes[letter + "." + position] = positionalClass
+                for position in table.characterPositions[charName]:
+                    name = letter + "." + position
+                    positionalClass = self.namedGlyphClass(name, buckets.positional[name])
+                    self.classes[name] = positionalClass
                     positionalClasses.append(positionalClass)
                     categoryToClasses.setdefault(
                         locale + "-" + genderNeutralCategory + "." + position, []
                     ).append(positionalClass)
 
-                    lvsVariants = [
-                        GlyphDescriptor.fromData(charName, position, i, locale=self.locale)
-                        for i in variants.values()
-                        if locale in i.locales and i.locales[locale].lvs
-                    ]
-                    if lvsVariants:
-                        lvsVariants = [
-                            str(
-                                GlyphDescriptor(
-                                    v.codePoints + [0x1843], v.units + ["Lv"], v.position
-                                )
-                            )
-                            for v in lvsVariants
-                        ]
-                        lvsPositionalClass = self.namedGlyphClass(
-                            letter + "_lvs." + position, lvsVariants
-                        )
-                        self.classes[letter + "_lvs." + position] = lvsPositionalClass
+                    name = letter + "_lvs." + position
+                    if lvsVariants := buckets.lvs.get(name):
+                        lvsPositionalClass = self.namedGlyphClass(name, lvsVariants)
+                        self.classes[name] = lvsPositionalClass
                         lvsPositionalClasses.append(lvsPositionalClass)
 
                 letterClass = self.namedGlyphClass(letter, positionalClasses)
@@ -298,26 +365,10 @@ class MongFeaComposer(FeaComposer):
             for name, positionalClasses in categoryToClasses.items():
                 self.classes[name] = self.namedGlyphClass(name, positionalClasses)
 
-        for locale in self.locales:
+        for locale, buckets in localeToBuckets.items():
             for condition in data.locales[locale].conditions:
                 with self.Lookup(f"{locale}:{condition}") as lookup:
-                    for alias in getAliasesByLocale(locale):
-                        charName = getCharNameByAlias(locale, alias)
-                        letter = locale + "-" + alias
-                        for position, fvsToVariant in data.variants[charName].items():
-                            for variant in fvsToVariant.values():
-                                if (
-                                    locale in variant.locales
-                                    and condition in variant.locales[locale].conditions
-                                ):
-                                    self.sub(
-                                        self.classes[letter + "." + position],
-                                        by=str(
-                                            GlyphDescriptor.fromData(
-                                                charName, position, variant, locale=self.locale
-                                            )
-                                        ),
-                                    )
+                    self.conditionRules(locale, condition, buckets)
                 self.conditions[lookup.name] = lookup
 
         if "MNG" in self.locales:
@@ -331,6 +382,58 @@ class MongFeaComposer(FeaComposer):
                         )
             self.conditions[lookup.name] = lookup
 
+    def bucketVariants(self, locale: LocaleID) -> "VariantBuckets":
+        """
+        Bucket variant glyph names of *locale* by positional class, LVS positional class and condition, in one pass over the variant data.
+
+        >>> composer = MongFeaComposer(cmap={}, glyphs=[], locales=["MNG"])
+        >>> buckets = composer.bucketVariants("MNG")
+        >>> buckets.positional["MNG-a.init"]
+        ['u1820.A.init', 'u1820.AA.init']
+        >>> buckets.conditions["chachlag"]
+        [('MNG-a.isol', 'u1820.Aa.isol'), ('MNG-e.isol', 'u1821.Aa.isol')]
+        """
+
+        table = variantTable()
+        buckets = VariantBuckets({}, {}, {})
+        for alias in getAliasesByLocale(locale):
+            charName = getCharNameByAlias(locale, alias)
+            letter = locale + "-" + alias
+            for position in table.characterPositions[charName]:
+                buckets.positional[letter + "." + position] = []
+            for row in table.select(character=charName, locales=locale):
+                position = table.joiningPosition(row)
+                variant = GlyphDescriptor.fromData(
+                    charName, position, table.variants[row], locale=self.locale
+                )
+                name = letter + "." + position
+                buckets.positional[name].append(str(variant))
+                if table.hasLvs(row, locale):
+                    lvsVariant = GlyphDescriptor(
+                        variant.codePoints + [0x1843], variant.units + ["Lv"], variant.position
+                    )
+                    buckets.lvs.setdefault(letter + "_lvs." + position, []).append(str(lvsVariant))
+                for condition in table.rowConditions(row, locale):
+                    substitutions = buckets.conditions.setdefault(condition, [])
+                    # Only the first variant with a condition applies, e.g. of MCHx medial g:
+                    if all(i != name for i, _ in substitutions):
+                        substitutions.append((name, str(variant)))
+        return buckets
+
+    def conditionRules(
+        self,
+        locale: LocaleID,
+        condition: str,
+        buckets: "VariantBuckets | None" = None,
+    ) -> None:
+        """
+        Rules of the condition lookup `{locale}:{condition}`, from *buckets* of `bucketVariants` or the variant data.
+        """
+
+        buckets = buckets or self.bucketVariants(locale)
+        for name, variant in buckets.conditions.get(condition, []):
+            self.sub(self.classes[name], by=variant)
+
     def variants(
         self,
         locale: LocaleID,
@@ -369,14 +472,21 @@ class MongFeaComposer(FeaComposer):
             else ([positions] if isinstance(positions, str) else positions)
         )
         aliases = aliases or getAliasesByLocale(locale)
+        table = variantTable()
         if isinstance(writtens, Callable):
             filter, writtens = (
                 writtens,
                 [
-                    "".join(variantGlyphDescriptor(locale, alias, position, fvs).units)
+                    "".join(
+                        GlyphDescriptor.fromData(
+                            table.charName(i), position, table.variants[i], locale=locale
+                        ).units
+                    )
                     for alias in aliases
                     for position in positions
-                    for fvs in data.variants[getCharNameByAlias(locale, alias)][position].keys()
+                    for i in table.select(
+                        character=getCharNameByAlias(locale, alias), position=position
+                    )
                 ],
             )
         else:
@@ -387,25 +497,26 @@ class MongFeaComposer(FeaComposer):
         for alias in aliases:
             charName = getCharNameByAlias(locale, alias)
             for position in positions:
+                descriptors = [
+                    GlyphDescriptor.fromData(charName, position, table.variants[i], locale=locale)
+                    for i in table.select(character=charName, position=position, locales=locale)
+                ]
                 for written in writtens:
                     if "Lv" not in written:
                         variants = [
                             w
-                            for fvs in data.variants[charName][position].keys()
-                            if (w := variantGlyphDescriptor(locale, alias, position, fvs)).units
-                            == splitWrittens(written)
-                            and filter(w.units)
-                            and locale in data.variants[charName][position][fvs].locales
+                            for w in descriptors
+                            if w.units == splitWrittens(written) and filter(w.units)
                         ]
                     else:
                         variants = []
                         key = f"{locale}-{alias}_lvs.{position}"
                         if key in self.classes:
                             variants = [
-                                GlyphDescriptor.parse(g.glyph)
+                                GlyphDescriptor.parse(g.glyph, trusted=True)
                                 for g in self.classes[key].glyphs.glyphs
                                 if written in g.glyph
-                                and filter(GlyphDescriptor.parse(g.glyph).units)
+                                and filter(GlyphDescriptor.parse(g.glyph, trusted=True).units)
                             ]
                     glyphs.extend(str(v) for v in variants if str(v) not in glyphs)
         return self.glyphClass(glyphs)
@@ -430,22 +541,14 @@ class MongFeaComposer(FeaComposer):
         return name
 
 
-def variantGlyphDescriptor(
-    locale: LocaleID,
-    alias: str,
-    position: JoiningPosition,
-    fvs: FVS = 0,
-) -> GlyphDescriptor:
-    """
-    >>> str(variantGlyphDescriptor("MCH", "zr", "fina"))
-    'u1877.Jc.medi._fina'
-    >>> str(variantGlyphDescriptor("MCHx", "zr", "fina"))
-    'u1877.Jc.fina'
-    """
-
-    charName = getCharNameByAlias(locale, alias)
-    variant = data.variants[charName][position][fvs]
-    return GlyphDescriptor.fromData(charName, position, variant, locale=locale)
+@dataclass
+class VariantBuckets:
+    positional: dict[str, list[str]]
+    """Positional class name, e.g. `MNG-a.init` -> variant glyph names."""
+    lvs: dict[str, list[str]]
+    """LVS positional class name, e.g. `TOD-a_lvs.init` -> glyph names of variants with LVS."""
+    conditions: dict[str, list[tuple[str, str]]]
+    """Condition -> positional class names and variant glyph names to substitute them with, at most one per class."""
 
 
 def _findMemberNames(
@@ -466,3 +569,14 @@ def _findMemberNames(
         if len(writtenVariants) == len(writtenTarget.units):
             return ["_" + i for i in writtenVariants]
     raise NotImplementedError(writtenTarget)
+
+
+def _glyphNames(glyph) -> list[str]:
+    """Glyph names of a glyph or glyph class in feaLib AST, with nested class references flattened."""
+    if isinstance(glyph, str):
+        return [glyph]
+    elif isinstance(glyph, ast.GlyphName):
+        return [glyph.glyph]
+    elif isinstance(glyph, (ast.GlyphClass, ast.GlyphClassName, ast.MarkClassName)):
+        return [j for i in glyph.glyphSet() for j in _glyphNames(i)]
+    raise NotImplementedError(glyph)
@@ -0,0 +1,103 @@
+import json
+from dataclasses import asdict
+from functools import cache
+from hashlib import sha256
+from pathlib import Path
+
+from ..data.types import LocaleID
+from ..spec import FontSpec, GlyphSpec
+from . import MongFeaComposer
+
+packageDir = Path(__file__).parent.parent
+
+
+@cache
+def packageHash() -> str:
+    """
+    Hash of the package’s data files and source code, as both the data and the composer logic determine the composition.
+    """
+
+    hash = sha256()
+    for path in sorted(packageDir.rglob("*")):
+        if path.is_file() and path.suffix in [".py", ".json"]:
+            hash.update(path.relative_to(packageDir).as_posix().encode())
+            hash.update(path.read_bytes())
+    return hash.hexdigest()
+
+
+def compositionKey(
+    cmap: dict[int, str],
+    glyphs: list[str],
+    locales: list[LocaleID],
+    compactGenderHarmony: bool = False,
+) -> str:
+    """
+    Hash of everything `MongFeaComposer.compose` depends on. Outlines are not involved.
+    """
+
+    inputs = {
+        "cmap": sorted(cmap.items()),
+        "glyphs": glyphs,
+        "locales": locales,
+        "compactGenderHarmony": compactGenderHarmony,
+        "package": packageHash(),
+    }
+    return sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def loadComposition(
+    directory: Path,
+    cmap: dict[int, str],
+    glyphs: list[str],
+    locales: list[LocaleID],
+    compactGenderHarmony: bool = False,
+) -> tuple[FontSpec, str] | None:
+    """Return the cached spec and feature code for the inputs, if any."""
+
+    path = directory / f"{compositionKey(cmap, glyphs, locales, compactGenderHarmony)}.json"
+    if not path.exists():
+        return None
+    content = json.loads(path.read_text(encoding="utf-8"))
+    spec = FontSpec(
+        cmap={int(k): v for k, v in content["spec"]["cmap"].items()},
+        newGlyphs={k: GlyphSpec(**v) for k, v in content["spec"]["newGlyphs"].items()},
+        openTypeCategories=content["spec"]["openTypeCategories"],
+    )
+    return spec, content["fea"]
+
+
+def saveComposition(
+    directory: Path,
+    cmap: dict[int, str],
+    glyphs: list[str],
+    locales: list[LocaleID],
+    spec: FontSpec,
+    fea: str,
+    compactGenderHarmony: bool = False,
+) -> None:
+    path = directory / f"{compositionKey(cmap, glyphs, locales, compactGenderHarmony)}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    content = {"spec": asdict(spec), "fea": fea}
+    path.write_text(json.dumps(content, ensure_ascii=False), encoding="utf-8")
+
+
+def composeCached(
+    cmap: dict[int, str],
+    glyphs: list[str],
+    locales: list[LocaleID],
+    directory: Path,
+    compactGenderHarmony: bool = False,
+) -> tuple[FontSpec, str]:
+    """
+    Compose the spec and feature code, or load them from *directory* when only outlines changed since they were cached.
+    """
+
+    if cached := loadComposition(directory, cmap, glyphs, locales, compactGenderHarmony):
+        return cached
+    c = MongFeaComposer(
+        cmap=cmap, glyphs=glyphs, locales=locales, compactGenderHarmony=compactGenderHarmony
+    )
+    spec = c.compose()
+    fea = c.asFeatureFile().asFea()
+    saveComposition(directory, cmap, glyphs, locales, spec, fea, compactGenderHarmony)
+    return spec, fea
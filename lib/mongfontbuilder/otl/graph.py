@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+
+from fontTools.feaLib import ast
+
+from . import MongFeaComposer
+
+
+@dataclass
+class LookupGraph:
+    """
+    Dependency graph of lookups in a feature file. Features reference the lookups they apply, and lookups reference the lookups applied by their contextual rules.
+    """
+
+    features: dict[str, list[str]] = field(default_factory=dict)
+    """Feature tag -> names of lookups applied by the feature."""
+    references: dict[str, list[str]] = field(default_factory=dict)
+    """Lookup name -> names of lookups referenced by the lookup."""
+    standalone: list[str] = field(default_factory=list)
+    """Names of lookups defined outside features, applied only through references."""
+
+    @classmethod
+    def fromStatements(cls, statements: list[ast.Statement]) -> LookupGraph:
+        graph = cls()
+        for statement in statements:
+            if isinstance(statement, ast.LookupBlock):
+                graph.standalone.append(statement.name)
+                graph._addLookup(statement)
+            elif isinstance(statement, ast.FeatureBlock):
+                lookups = graph.features.setdefault(statement.name, [])
+                for i in statement.statements:
+                    if isinstance(i, ast.LookupBlock):
+                        graph._addLookup(i)
+                        name = i.name
+                    elif isinstance(i, ast.LookupReferenceStatement):
+                        name = i.lookup.name
+                    else:
+                        continue
+                    if name not in lookups:
+                        lookups.append(name)
+        return graph
+
+    def _addLookup(self, lookup: ast.LookupBlock) -> None:
+        references = self.references.setdefault(lookup.name, [])
+        for statement in lookup.statements:
+            if isinstance(statement, ast.ChainContextSubstStatement):
+                for lookups in statement.lookups:
+                    for i in lookups or []:
+                        if i.name not in references:
+                            references.append(i.name)
+
+    def reachable(self) -> set[str]:
+        """Names of lookups applied by features, directly or through references."""
+
+        reachable = set[str]()
+        pending = [i for lookups in self.features.values() for i in lookups]
+        while pending:
+            name = pending.pop()
+            if name not in reachable:
+                reachable.add(name)
+                pending.extend(self.references.get(name, []))
+        return reachable
+
+    def unreachable(self) -> list[str]:
+        reachable = self.reachable()
+        return [i for i in self.standalone if i not in reachable]
+
+    def asDict(self) -> dict:
+        return {
+            "features": self.features,
+            "references": self.references,
+            "unreachable": self.unreachable(),
+        }
+
+    def asJson(self) -> str:
+        return json.dumps(self.asDict(), indent=2)
+
+    def asDot(self) -> str:
+        """
+        >>> graph = LookupGraph({"rclt": ["A"]}, {"A": ["B"], "B": [], "C": []}, ["B", "C"])
+        >>> print(graph.asDot())
+        digraph lookups {
+          rankdir=LR;
+          "feature rclt" [shape=box];
+          "feature rclt" -> "A";
+          "A" -> "B";
+          "C" [style=dashed];
+        }
+        """
+
+        unreachable = self.unreachable()
+        lines = ["digraph lookups {", "  rankdir=LR;"]
+        for feature, lookups in self.features.items():
+            lines.append(f'  "feature {feature}" [shape=box];')
+            lines.extend(f'  "feature {feature}" -> "{i}";' for i in lookups)
+        for lookup, references in self.references.items():
+            lines.extend(f'  "{lookup}" -> "{i}";' for i in references)
+        lines.extend(f'  "{i}" [style=dashed];' for i in unreachable)
+        lines.append("}")
+        return "\n".join(lines)
+
+
+def dropUnreachableLookups(c: MongFeaComposer) -> list[str]:
+    """
+    Remove standalone lookups that no feature applies, directly or through references, and return their names. Such lookups, e.g. conditions only used by other locales, would otherwise still be compiled into the font.
+    """
+
+    unreachable = LookupGraph.fromStatements(c.root).unreachable()
+    c.root[:] = [
+        i for i in c.root if not (isinstance(i, ast.LookupBlock) and i.name in unreachable)
+    ]
+    for name in unreachable:
+        c.conditions.pop(name, None)
+    return unreachable
@@ -1,6 +1,7 @@
 from fontTools import unicodedata
 
-from .. import GlyphDescriptor, data, uNameFromCodePoint
+from .. import GlyphDescriptor, uNameFromCodePoint
+from ..data.table import variantTable
 from ..data.types import joiningPositions
 from . import MongFeaComposer
 
@@ -10,14 +11,13 @@ def compose(c: MongFeaComposer) -> None:
     **Phase IIa.1: Initiation of cursive positions**
     """
 
-    localeSet = {*c.locales}
+    table = variantTable()
     for position in joiningPositions:
         with c.Lookup(f"IIa.{position}", feature=position):
-            for charName, positionToFVSToVariant in data.variants.items():
-                if any(
-                    localeSet.intersection(i.locales)
-                    for i in positionToFVSToVariant[position].values()
-                ):
+            rows = table.select(position=position, locales=c.locales)
+            characters = {table.character[i] for i in rows}
+            for characterID, charName in enumerate(table.characters):
+                if characterID in characters:
                     c.sub(
                         uNameFromCodePoint(ord(unicodedata.lookup(charName))),
                         by=str(GlyphDescriptor.fromData(charName, position, locale=c.locale)),
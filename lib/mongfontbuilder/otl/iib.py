@@ -1,14 +1,23 @@
 from collections.abc import Iterator
+from dataclasses import dataclass, field
 from itertools import product
 
-from fontTools import unicodedata
-
-from .. import GlyphDescriptor, data, ligateParts, splitWrittens, writtenCombinations
-from ..data.types import JoiningPosition, LocaleID
+from .. import (
+    GlyphDescriptor,
+    data,
+    joiningPositionConcatenation,
+    ligateParts,
+    splitWrittens,
+    writtenCombinations,
+)
+from ..data.table import aliasTable, variantTable
+from ..data.types import CharacterName, JoiningPosition, LocaleID, LocaleNamespace, joiningPositions
 from ..spec import GlyphSpec
-from ..utils import namespaceFromLocale
+from ..utils import getAliasesByLocale, namespaceFromLocale
 from . import MongFeaComposer
 
+PartKey = tuple[tuple[str, ...], JoiningPosition]
+
 
 def compose(c: MongFeaComposer) -> None:
     iib1(c)
@@ -24,76 +33,195 @@ def iib1(c: MongFeaComposer) -> None:
     """
 
     with c.Lookup(f"IIb.ligature", feature="rclt"):
-        inputToLigatureAndRequired = dict[
-            tuple[GlyphDescriptor, ...], tuple[GlyphDescriptor, bool]
-        ]()
-        for locale in c.locales:
-            namespace = namespaceFromLocale(locale)
-            vowelAliases = data.locales[locale].categories["vowel"]
-            for category, ligatureToPositions in data.ligatures.items():
-                required = category == "required"
-                for writtens, positions in ligatureToPositions.items():
-                    for position in positions:
-                        for input, ligature in iterLigatureSubstitutions(
-                            c, writtens, position, locale
-                        ):
-                            if required:
-                                # Check the second glyph, ignoring LVS:
-                                codePoint = input[1].codePoints[0]
-                                alias = data.aliases[unicodedata.name(chr(codePoint))]
-                                if isinstance(alias, dict):
-                                    alias = alias[namespace]
-                                if alias not in vowelAliases:
-                                    continue
-                            # Deduplicate inputs between locales:
-                            if existing := inputToLigatureAndRequired.get(input):
-                                assert existing == (ligature, required)
-                            else:
-                                inputToLigatureAndRequired[input] = ligature, required
-
-        for input, (ligature, required) in inputToLigatureAndRequired.items():
-            implementLigature(c, input, ligature)
-
-        if "MNGx" in c.locales:
-            c.sub("u18A6.Wp.medi", "u1820.A.fina", by="u18A6_u1820.WpA.fina")
-            c.sub("u188A.NG.init", "u1820.Aa.fina", by="u188A_u1820.NGAa.isol")
-            c.sub("u188A.NG.medi", "u1820.Aa.fina", by="u188A_u1820.NGAa.fina")
-        if "TODx" in c.locales:
-            # TODO
-            ...
-        if "MCH" in c.locales:
-            # TODO
-            ...
-
-
-def iterLigatureSubstitutions(
-    c: MongFeaComposer,
-    writtens: str,
-    position: JoiningPosition,
-    locale: LocaleID,
-) -> Iterator[tuple[tuple[GlyphDescriptor, ...], GlyphDescriptor]]:
-    for combination in writtenCombinations(splitWrittens(writtens), position):
-        if len(combination) != 2:
-            continue
-        writtenLists = [
+        ligatureRules(c)
+
+
+def ligatureRules(c: MongFeaComposer) -> None:
+    """Rules of `IIb.ligature` from the ligature data."""
+
+    planner = LigaturePlanner.fromComposer(c)
+    report = c.ligatureReport = planner.report
+    aliases = aliasTable()
+    inputToLigatureAndRequired = dict[tuple[GlyphDescriptor, ...], tuple[GlyphDescriptor, bool]]()
+    for locale in c.locales:
+        for category, ligatureToPositions in data.ligatures.items():
+            required = category == "required"
+            for writtens, positions in ligatureToPositions.items():
+                for position in positions:
+                    for input, ligature in planner.substitutions(writtens, position, locale):
+                        # Check the second glyph, ignoring LVS:
+                        codePoint = input[1].codePoints[0]
+                        if required and not aliases.inCategory(codePoint, locale, "vowel"):
+                            report.notVowel += 1
+                            continue
+                        # Deduplicate inputs between locales:
+                        if existing := inputToLigatureAndRequired.get(input):
+                            assert existing == (ligature, required)
+                            report.duplicates += 1
+                        else:
+                            inputToLigatureAndRequired[input] = ligature, required
+
+    for input, (ligature, required) in inputToLigatureAndRequired.items():
+        if implementLigature(c, input, ligature):
+            report.rules += 1
+        else:
+            report.missingGlyphs += 1
+
+    if "MNGx" in c.locales:
+        c.sub("u18A6.Wp.medi", "u1820.A.fina", by="u18A6_u1820.WpA.fina")
+        c.sub("u188A.NG.init", "u1820.Aa.fina", by="u188A_u1820.NGAa.isol")
+        c.sub("u188A.NG.medi", "u1820.Aa.fina", by="u188A_u1820.NGAa.fina")
+    if "TODx" in c.locales:
+        # TODO
+        ...
+    if "MCH" in c.locales:
+        # TODO
+        ...
+
+
+@dataclass
+class LigatureReport:
+    """Numbers of ligature candidates, i.e., pairs of parts from the ligature data, and of candidates discarded by each filter in order."""
+
+    candidates: int = 0
+    missingGlyphs: int = 0
+    """Neither the ligature nor its component glyph is in the font."""
+    notVowel: int = 0
+    """The second part of a required ligature is not a vowel of the locale."""
+    duplicates: int = 0
+    """Already generated for another locale."""
+    rules: int = 0
+
+    def __str__(self) -> str:
+        return "\n".join(
             [
-                GlyphDescriptor.parse(glyph.glyph)
-                for glyph in c.writtens(
-                    locale,
-                    *units.split("."),  # type: ignore
-                ).glyphs
+                f"Ligature candidates: {self.candidates}",
+                f"  missing glyphs: -{self.missingGlyphs}",
+                f"  not followed by vowels: -{self.notVowel}",
+                f"  duplicated between locales: -{self.duplicates}",
+                f"Ligature rules: {self.rules}",
             ]
-            for units in combination
-        ]
-        for parts in product(*writtenLists):
-            yield parts, ligateParts([*parts])
+        )
+
+
+@dataclass
+class LigaturePlanner:
+    """
+    Ligature substitutions, i.e., pairs of parts from `MongFeaComposer.writtens` and their ligatures, enumerated against an index of the glyph inventory. Parts are looked up from variants indexed by written units and position, built once per locale, and pairs of parts are only enumerated when the font has glyphs for their ligature or its component, which `implementLigature` requires. Without glyphs, all ligatures are composed.
+    """
+
+    c: MongFeaComposer
+    emittable: set[tuple[str, JoiningPosition]] | None
+    """Written units and positions of ligature and component glyphs in the font."""
+    localeToParts: dict[LocaleID, dict[PartKey, list[GlyphDescriptor]]] = field(
+        default_factory=dict
+    )
+    lvsParts: dict[tuple[LocaleID, str], list[GlyphDescriptor]] = field(default_factory=dict)
+    namespaceToCharNames: dict[LocaleNamespace, dict[str, CharacterName]] = field(
+        default_factory=dict
+    )
+    report: LigatureReport = field(default_factory=LigatureReport)
+
+    @classmethod
+    def fromComposer(cls, c: MongFeaComposer) -> "LigaturePlanner":
+        if not c.glyphs:
+            return cls(c, None)
+        descriptors, _ = GlyphDescriptor.parseMany(c.glyphs)
+        emittable = {
+            ("".join(i.units), i.position) for i in descriptors if len(i.codePoints) != 1
+        }
+        return cls(c, emittable)
+
+    def substitutions(
+        self,
+        writtens: str,
+        position: JoiningPosition,
+        locale: LocaleID,
+    ) -> Iterator[tuple[tuple[GlyphDescriptor, ...], GlyphDescriptor]]:
+        for combination in writtenCombinations(splitWrittens(writtens), position):
+            if len(combination) != 2:
+                continue
+            firsts, seconds = (self.parts(locale, i) for i in combination)
+            self.report.candidates += len(firsts) * len(seconds)
+            candidates = None
+            if self.emittable is not None:
+                candidates = {
+                    (i, j)
+                    for i in {_partKey(k) for k in firsts}
+                    for j in {_partKey(k) for k in seconds}
+                    if _ligatureKey(i, j) in self.emittable
+                }
+                if not candidates:
+                    self.report.missingGlyphs += len(firsts) * len(seconds)
+                    continue
+            for parts in product(firsts, seconds):
+                if candidates and (_partKey(parts[0]), _partKey(parts[1])) not in candidates:
+                    self.report.missingGlyphs += 1
+                    continue
+                yield parts, ligateParts([*parts])
+
+    def parts(self, locale: LocaleID, units: str) -> list[GlyphDescriptor]:
+        """Glyphs of `MongFeaComposer.writtens` for *units*, e.g. `A.init`."""
+
+        written, position = units.split(".")
+        if "Lv" in written:
+            # Matched against glyph names of LVS classes by substring:
+            if (locale, units) not in self.lvsParts:
+                parts = self.lvsParts[locale, units] = list[GlyphDescriptor]()
+                for alias in getAliasesByLocale(locale):
+                    lvs = self.c.classes.get(f"{locale}-{alias}_lvs.{position}")
+                    for glyph in lvs.glyphs.glyphs if lvs else []:
+                        part = GlyphDescriptor.parse(glyph.glyph, trusted=True)
+                        if written in glyph.glyph and part not in parts:
+                            parts.append(part)
+            return self.lvsParts[locale, units]
+        if locale not in self.localeToParts:
+            self.localeToParts[locale] = self._indexParts(locale)
+        key = tuple(splitWrittens(written)), position
+        return self.localeToParts[locale].get(key, [])  # type: ignore
+
+    def _indexParts(self, locale: LocaleID) -> dict[PartKey, list[GlyphDescriptor]]:
+        namespace = namespaceFromLocale(locale)
+        if namespace not in self.namespaceToCharNames:
+            charNames = dict[str, CharacterName]()
+            for charName, alias in data.aliases.items():
+                alias = alias if isinstance(alias, str) else alias.get(namespace)
+                if alias:
+                    charNames.setdefault(alias, charName)
+            self.namespaceToCharNames[namespace] = charNames
+        charNames = self.namespaceToCharNames[namespace]
+
+        keyToParts = dict[PartKey, list[GlyphDescriptor]]()
+        names = set[str]()
+        table = variantTable()
+        for alias in getAliasesByLocale(locale):
+            charName = charNames[alias]
+            for position in joiningPositions:
+                for row in table.select(character=charName, position=position, locales=locale):
+                    part = GlyphDescriptor.fromData(
+                        charName, position, table.variants[row], locale=locale
+                    )
+                    if (name := str(part)) not in names:
+                        names.add(name)
+                        keyToParts.setdefault((tuple(part.units), position), []).append(part)
+        return keyToParts
+
+
+def _partKey(part: GlyphDescriptor) -> PartKey:
+    return tuple(part.units), part.position
+
+
+def _ligatureKey(first: PartKey, second: PartKey) -> tuple[str, JoiningPosition]:
+    return "".join(first[0] + second[0]), joiningPositionConcatenation[first[1], second[1]]
 
 
 def implementLigature(
     c: MongFeaComposer,
     input: tuple[GlyphDescriptor, ...],
     ligature: GlyphDescriptor,
-) -> None:
+) -> bool:
+    """Substitute *input* with *ligature*, unless neither the ligature nor its component glyph exists. Return whether substituted."""
+
     inputNames = [str(i) for i in input]
     ligatureName = str(ligature)
     if c.glyphs and ligatureName not in c.glyphs:
@@ -101,11 +229,13 @@ def implementLigature(
         if componentName not in c.glyphs:
             # we don't check ligatures when generating, only generate OTL for existing glyphs,
             # so it's possible for the component to be missing.
-            return
-        c.spec.newGlyphs[c.glyphNameProcessor(ligatureName)] = GlyphSpec(
-            [c.glyphNameProcessor(componentName)]
-        )
+            return False
+        processedName = c.glyphNameProcessor(ligatureName)
+        if processedName not in c.spec.newGlyphs:
+            c.ligatureGlyphs.append(processedName)
+        c.spec.newGlyphs[processedName] = GlyphSpec([c.glyphNameProcessor(componentName)])
     c.sub(*inputNames, by=ligatureName)
+    return True
 
 
 def iib2(c: MongFeaComposer) -> None:
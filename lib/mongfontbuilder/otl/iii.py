@@ -1,15 +1,43 @@
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Literal
+
 from fontTools.feaLib import ast
 
 from .. import GlyphDescriptor, data, getPosition, ligateParts
-from ..data.types import fina, init, isol, medi
+from ..data.table import variantTable
+from ..data.types import JoiningPosition, LocaleID, fina, init, isol, medi
 from ..utils import getAliasesByLocale, getCharNameByAlias
 from . import MongFeaComposer
 
 MARKER_MASCULINE, MARKER_FEMININE = "marker.masculine", "marker.feminine"
-MARKER_INITIAL = "marker.initial"
 MARKER_MASCULINE_FALSE, MARKER_MASCULINE_TRUE = "marker.masculine.false", "marker.masculine.true"
 
 
+def harmonyMarker(preceding: str, following: str) -> str:
+    """
+    State marker of the compact gender harmony, for the gender passed forward from the *preceding* vowel (`none`, `masculine` or `feminine`) and the gender passed backward from the *following* vowel (`none` or `masculine`).
+    """
+
+    return f"marker.harmony.{preceding}.{following}"
+
+
+HARMONY_MARKERS = [
+    harmonyMarker(preceding, following)
+    for preceding in ["none", "masculine", "feminine"]
+    for following in ["none", "masculine"]
+]
+
+
+particleLocales: list[LocaleID] = ["MNG", "SIB", "MCH"]
+"""Locales whose particle rules come from the particle data."""
+
+maxInitialCluster = 9
+"""Longest initial consonant cluster, including the initial consonant, after which Hudum _o_, _u_, _oe_ and _ue_ still apply `marked`."""
+
+
 def compose(c: MongFeaComposer) -> None:
     iii0(c)
     iii1(c)
@@ -28,7 +56,10 @@ def iii0(c: MongFeaComposer) -> None:
 
     iii0a(c)
     if "MNG" in c.locales:
-        iii0b(c)
+        if c.compactGenderHarmony:
+            iii0bCompact(c)
+        else:
+            iii0b(c)
 
 
 def iii0a(c: MongFeaComposer) -> None:
@@ -220,6 +251,110 @@ def iii0b(c: MongFeaComposer) -> None:
         c.sub(MARKER_MASCULINE, MARKER_FEMININE, by=MARKER_FEMININE)
 
 
+def iii0bCompact(c: MongFeaComposer) -> None:
+    """
+    Same as `iii0b`, in five lookups. Instead of propagating gender markers inserted after every letter, only one state marker (`harmonyMarker`) is inserted after each letter taking part in gender harmony, and is substituted in place: forward by a chaining lookup reading the state of the previous letter, and backward by a reverse chaining lookup. Finally, the states after _g_ and _h_ become `marker.masculine` or `marker.feminine` as in `iii0b`, and other states are removed.
+    """
+
+    categories = data.locales["MNG"].categories
+    allAliases = (
+        categories["vowelMasculine"]
+        + categories["vowelFeminine"]
+        + categories["vowelNeuter"]
+        + categories["consonant"]
+    )
+    passingAliases = (
+        categories["vowelMasculine"] + categories["vowelNeuter"] + categories["consonant"]
+    )
+    genders = ["masculine", "feminine"]
+    followings = ["none", "masculine"]
+
+    with c.Lookup("III.ig.harmony.A", feature="rclt", flags={"IgnoreMarks": True}):
+        for alias in allAliases:
+            for position in (init, medi, fina):
+                preceding = following = "none"
+                for gender in genders:
+                    if alias in categories[f"vowel{gender.title()}"] and position != fina:
+                        preceding = gender
+                if alias in categories["vowelMasculine"] and position != init:
+                    following = "masculine"
+                default = c.getDefault(alias, position)
+                c.sub(default, by=[default, harmonyMarker(preceding, following)])
+
+    with c.Lookup("III.ig.harmony.B", feature="rclt", flags={"IgnoreMarks": True}):
+        forwardPassing = c.glyphClass(
+            [
+                c.getDefault(alias, position)
+                for alias in categories["vowelNeuter"] + categories["consonant"]
+                for position in (medi, fina)
+            ]
+        )
+        for gender in genders:
+            states = c.glyphClass([harmonyMarker(gender, i) for i in followings])
+            c.sub(
+                states,
+                forwardPassing,
+                c.input(c.glyphClass([harmonyMarker("none", i) for i in followings])),
+                by=states,
+            )
+
+    with c.Lookup("III.ig.harmony.C", feature="rclt", flags={"IgnoreMarks": True}):
+        preceding = ["none", *genders]
+        falseStates = c.glyphClass([harmonyMarker(i, "none") for i in preceding])
+        trueStates = c.glyphClass([harmonyMarker(i, "masculine") for i in preceding])
+        backwardPassing = c._normalized(
+            c.glyphClass(
+                [
+                    c.getDefault(alias, position)
+                    for alias in passingAliases
+                    for position in (init, medi, fina, isol)
+                ]
+            )
+        )
+        mvsA = [c._normalized(c.classes["mvs"]), c._normalized(c.getDefault("a", "isol"))]
+        fvs = c._normalized(c.classes["fvs"])
+        for precedingFvs in [[], [fvs]]:
+            # MVS and _a_ not followed by FVS, as in `III.ig.preprocessing.I.A`:
+            for suffix, replacements in [
+                ([*precedingFvs, *mvsA, fvs], falseStates),
+                ([*precedingFvs, *mvsA], trueStates),
+            ]:
+                c.current.append(
+                    ast.ReverseChainSingleSubstStatement(
+                        old_prefix=[],
+                        glyphs=[falseStates],
+                        old_suffix=suffix,
+                        replacements=[replacements],
+                    )
+                )
+        c.current.append(
+            ast.ReverseChainSingleSubstStatement(
+                old_prefix=[],
+                glyphs=[falseStates],
+                old_suffix=[backwardPassing, trueStates],
+                replacements=[trueStates],
+            )
+        )
+
+    with c.Lookup("III.ig.harmony.D", feature="rclt"):
+        for alias in ["g", "h"]:
+            defaults = c.glyphClass([c.getDefault(alias, i) for i in (init, medi, fina)])
+            masculine = [harmonyMarker("masculine", i) for i in followings]
+            if alias == "g":
+                # Only _g_ takes masculinity passed backward:
+                masculine.append(harmonyMarker("none", "masculine"))
+            feminine = [harmonyMarker("feminine", i) for i in followings]
+            c.sub(defaults, c.input(c.glyphClass(masculine)), by=MARKER_MASCULINE)
+            c.sub(defaults, c.input(c.glyphClass(feminine)), by=MARKER_FEMININE)
+
+    with c.Lookup("III.ig.harmony.E", feature="rclt"):
+        states = c.glyphClass(HARMONY_MARKERS)
+        for alias in allAliases:
+            for position in (init, medi, fina):
+                default = c.getDefault(alias, position)
+                c.sub(default, states, by=default)
+
+
 def iii1(c: MongFeaComposer) -> None:
     """
     **Phase III.1: Phonetic - Chachlag**
@@ -311,37 +446,28 @@ def iii2a(c: MongFeaComposer) -> None:
                     )
 
     if "MNG" in c.locales:
-        with c.Lookup("III.o_u_oe_ue.marked.emit", feature="rclt", flags={"IgnoreMarks": True}):
-            for alias in categories["consonant"]:
-                default = c.getDefault(alias, "init")
-                c.sub(default, by=[default, MARKER_INITIAL])
-
-        with c.Lookup(
-            "III.o_u_oe_ue.marked.propagate",
-            feature="rclt",
-            flags={"UseMarkFilteringSet": c.glyphClass([MARKER_INITIAL])},
-        ):
-            for alias in categories["consonant"]:
-                for position in (medi, fina):
-                    default = c.getDefault(alias, position)
-                    c.sub(MARKER_INITIAL, c.input(default), by=[default, MARKER_INITIAL])
-
         with c.Lookup(
-            "III.o_u_oe_ue.marked.mark_vowel",
+            "III.o_u_oe_ue.marked.cluster",
             feature="rclt",
-            flags={"UseMarkFilteringSet": c.glyphClass([MARKER_INITIAL])},
+            flags={"IgnoreMarks": True},
         ):
-            c.sub(
-                MARKER_INITIAL,
-                c.input(c.variants("MNG", ["o", "u", "oe", "ue"]), c.conditions["MNG:marked"]),
-                by=None,
+            initials = c.glyphClass(
+                [c.getDefault(alias, init) for alias in categories["consonant"]]
             )
-
-        with c.Lookup("III.o_u_oe_ue.marked.cleanup", feature="rclt"):
-            for alias in categories["consonant"]:
-                for position in (init, medi, fina):
-                    default = c.getDefault(alias, position)
-                    c.sub(default, MARKER_INITIAL, by=default)
+            medials = c.glyphClass(
+                [
+                    c.getDefault(alias, position)
+                    for alias in categories["consonant"]
+                    for position in (medi, fina)
+                ]
+            )
+            for length in range(maxInitialCluster):
+                c.sub(
+                    initials,
+                    *[medials] * length,
+                    c.input(c.variants("MNG", ["o", "u", "oe", "ue"]), c.conditions["MNG:marked"]),
+                    by=None,
+                )
 
         with c.Lookup(
             "III.o_u_oe_ue.marked.GB.A",
@@ -749,6 +875,7 @@ def iii2f(c: MongFeaComposer) -> None:
                 by=None,
             )
 
+        table = variantTable()
         for index in [0, 1]:
             step = ["A", "B"][index]
             genderMarker = [MARKER_MASCULINE, MARKER_FEMININE][index]
@@ -761,9 +888,10 @@ def iii2f(c: MongFeaComposer) -> None:
                 for alias in ["h", "g"]:
                     charName = getCharNameByAlias("MNG", alias)
                     for position in (init, medi, fina):
-                        variants = data.variants[charName].get(position, {})
-                        for i in variants.values():
-                            variant = str(GlyphDescriptor.fromData(charName, position, i))
+                        for i in table.select(character=charName, position=position):
+                            variant = str(
+                                GlyphDescriptor.fromData(charName, position, table.variants[i])
+                            )
                             c.sub(variant, genderMarker, by=variant)
 
 
@@ -819,43 +947,14 @@ def iii3(c: MongFeaComposer) -> None:
     (3) According to GB, apply `_.wide` for MVS preceding Hudum string in Hudum.
     """
 
-    for locale in ["MNG", "SIB", "MCH"]:
+    for locale in particleLocales:
         if locale in c.locales:
             with c.Lookup(
                 f"III.particle.{locale}",
                 feature="rclt",
                 flags={"UseMarkFilteringSet": c.classes["fvs"]},
             ):
-                for aliasString, indices in data.particles[locale].items():
-                    aliasList = aliasString.split()
-                    hasMvs = aliasList[0] == "mvs"
-                    if hasMvs:
-                        aliasList = aliasList[1:]
-                        indices = [index - 1 for index in indices]
-                    classList = []
-
-                    classList = [
-                        c.classes[f"{locale}-{alias}.{getPosition(index, len(aliasList))}"]
-                        for index, alias in enumerate(aliasList)
-                    ]
-
-                    subArgs: list = (
-                        [c.input(c.classes["mvs"], c.conditions["_.wide"])] if hasMvs else []
-                    )
-                    ignoreSubArgs: list = [c.input(c.classes["mvs"])] if hasMvs else []
-                    minIndex = 0 if hasMvs else min(indices)
-                    for i, glyphClass in enumerate(classList):
-                        if i in indices:
-                            subArgs.append(c.input(glyphClass, c.conditions[f"{locale}:particle"]))
-                            ignoreSubArgs.append(c.input(glyphClass))
-                        elif minIndex <= i <= max(indices):
-                            subArgs.append(c.input(glyphClass))
-                            ignoreSubArgs.append(c.input(glyphClass))
-                        else:
-                            subArgs.append(glyphClass)
-                            ignoreSubArgs.append(glyphClass)
-                    c.sub(*ignoreSubArgs, c.classes["fvs"], by=None)
-                    c.sub(*subArgs, by=None)
+                particleRules(c, locale)
 
     if "TOD" in c.locales:
         with c.Lookup("TOD:particle") as _particle:
@@ -885,6 +984,142 @@ def iii3(c: MongFeaComposer) -> None:
             )
 
 
+def particleRules(c: MongFeaComposer, locale: LocaleID) -> None:
+    """Rules of `III.particle.{locale}` from the particle data, with particles merged by `mergeParticles`."""
+
+    def glyphSet(alias: str, position: JoiningPosition) -> frozenset[str]:
+        return frozenset(c.classes[f"{locale}-{alias}.{position}"].glyphSet())
+
+    particles = mergeParticles(data.particles[locale], glyphSet)
+    c.particleRuleCounts[locale] = (2 * len(data.particles[locale]), 2 * len(particles))
+    for particle in particles:
+        classList = list[ast.GlyphClassName | ast.GlyphClass]()
+        for index, aliases in enumerate(particle.letters):
+            position = getPosition(index, len(particle.letters))
+            classes = [c.classes[f"{locale}-{alias}.{position}"] for alias in aliases]
+            classList.append(classes[0] if len(classes) == 1 else c.glyphClass(classes))
+
+        hasMvs, indices = particle.hasMvs, particle.indices
+        subArgs: list = [c.input(c.classes["mvs"], c.conditions["_.wide"])] if hasMvs else []
+        ignoreSubArgs: list = [c.input(c.classes["mvs"])] if hasMvs else []
+        for i, glyphClass in enumerate(classList):
+            context = particle.context(i)
+            if i in indices:
+                subArgs.append(c.input(glyphClass, c.conditions[f"{locale}:particle"]))
+                ignoreSubArgs.append(c.input(glyphClass))
+            elif context == "input":
+                subArgs.append(c.input(glyphClass))
+                ignoreSubArgs.append(c.input(glyphClass))
+            else:
+                subArgs.append(glyphClass)
+                ignoreSubArgs.append(glyphClass)
+        c.sub(*ignoreSubArgs, c.classes["fvs"], by=None)
+        c.sub(*subArgs, by=None)
+
+
+@dataclass
+class Particle:
+    hasMvs: bool
+    """Whether following MVS."""
+    letters: list[list[str]]
+    """Aliases of each letter, more than one for merged particles."""
+    indices: list[int]
+    """Indices of letters to apply `particle` to."""
+
+    @classmethod
+    def parse(cls, aliasString: str, indices: list[int]) -> "Particle":
+        """From an item of `data.particles[locale]`, whose indices count MVS."""
+
+        aliasList = aliasString.split()
+        hasMvs = aliasList[0] == "mvs"
+        if hasMvs:
+            aliasList = aliasList[1:]
+            indices = [index - 1 for index in indices]
+        return cls(hasMvs, [[alias] for alias in aliasList], indices)
+
+    def context(self, index: int) -> Literal["backtrack", "input", "lookahead"]:
+        """Context of the letter at *index* in the rules of this particle."""
+
+        if index < (0 if self.hasMvs else min(self.indices)):
+            return "backtrack"
+        return "input" if index <= max(self.indices) else "lookahead"
+
+
+def mergeParticles(
+    particles: dict[str, list[int]],
+    glyphSet: Callable[[str, JoiningPosition], frozenset[str]] | None = None,
+) -> list[Particle]:
+    """
+    Particles in data order, with particles that only differ in the aliases of one letter merged into one, so that they are matched by one rule instead of one rule each. Merged particles match the same letters as before, and different particles never match the same letters, as their positional classes differ in at least one letter, so moving rules up into merged ones doesn't change which rule applies.
+
+    With *glyphSet* of an alias at a joining position, particles are only merged while the glyph classes of each context stay disjoint or identical, so that feaLib can still build the lookup as one class-based (format 2) subtable. Otherwise feaLib falls back to one coverage-based (format 3) subtable per rule, which HarfBuzz matches more slowly than the unmerged rules.
+
+    >>> particles = {"mvs i y a r": [1, 2], "mvs i y e r": [1, 2], "mvs i y a n": [1, 2]}
+    >>> particles |= {"mvs i y e n": [1, 2], "mvs i": [1], "mvs u": [1]}
+    >>> [i.letters for i in mergeParticles(particles)]
+    [[['i'], ['y'], ['a', 'e'], ['r', 'n']], [['i', 'u']]]
+
+    Merging the first two particles would put `a.medi` in one class alone and in another along with `e.medi`:
+
+    >>> glyphSet = lambda alias, position: frozenset([f"{alias}.{position}"])
+    >>> [len(i.letters) for i in mergeParticles(particles, glyphSet)]
+    [4, 4, 4, 4, 1]
+    """
+
+    merged = [Particle.parse(k, v) for k, v in particles.items()]
+    while candidate := next(_iterMergedParticles(merged, glyphSet), None):
+        merged = candidate
+    return merged
+
+
+def _iterMergedParticles(
+    particles: list[Particle],
+    glyphSet: Callable[[str, JoiningPosition], frozenset[str]] | None,
+) -> Iterator[list[Particle]]:
+    for i, particle in enumerate(particles):
+        for j in range(i + 1, len(particles)):
+            other = particles[j]
+            if (particle.hasMvs, particle.indices, len(particle.letters)) != (
+                other.hasMvs,
+                other.indices,
+                len(other.letters),
+            ):
+                continue
+            differing = [
+                index
+                for index, (a, b) in enumerate(zip(particle.letters, other.letters))
+                if a != b
+            ]
+            if len(differing) != 1:
+                continue
+            [index] = differing
+            letters = [[*i] for i in particle.letters]
+            letters[index].extend(i for i in other.letters[index] if i not in letters[index])
+            candidate = [
+                *particles[:i],
+                Particle(particle.hasMvs, letters, particle.indices),
+                *particles[i + 1 : j],
+                *particles[j + 1 :],
+            ]
+            if glyphSet is None or _classDefCompatible(candidate, glyphSet):
+                yield candidate
+
+
+def _classDefCompatible(
+    particles: list[Particle],
+    glyphSet: Callable[[str, JoiningPosition], frozenset[str]],
+) -> bool:
+    contextToClasses = defaultdict[str, set[frozenset[str]]](set)
+    for particle in particles:
+        for index, aliases in enumerate(particle.letters):
+            position = getPosition(index, len(particle.letters))
+            glyphs = frozenset[str]().union(*(glyphSet(alias, position) for alias in aliases))
+            contextToClasses[particle.context(index)].add(glyphs)
+    return all(
+        not a & b for classes in contextToClasses.values() for a, b in combinations(classes, 2)
+    )
+
+
 def iii4(c: MongFeaComposer) -> None:
     """
     **Phase III.4: Graphemic - Devsger**
@@ -1255,38 +1490,38 @@ def iii6(c: MongFeaComposer) -> None:
     """
     **Phase III.6: Uncaptured - FVS-selected**
 
-    (1) Apply `manual` for letters preceding FVS.
+    (1) Apply `manual` for letters preceding FVS, with a mapping lookup and a rule per FVS.
 
     (2) Apply `manual` for letters preceding FVS that precedes LVS for Todo and Todo Ali Gali.
 
     (3) Apply `manual` for punctuation.
     """
 
+    table = variantTable()
     for locale in c.locales:
-        with c.Lookup(f"_.manual.{locale}") as _lvs:
-            for alias in getAliasesByLocale(locale):
-                charName = getCharNameByAlias(locale, alias)
-                letter = locale + "-" + alias
-                for position, variants in data.variants[charName].items():
-                    glyphClass = c.classes[letter + "." + position]
-                    for fvs, variant in variants.items():
-                        if fvs != 0 and locale in variant.locales:
-                            variant = str(GlyphDescriptor.fromData(charName, position, variant))
-                            c.sub(c.input(glyphClass), f"fvs{fvs}.ignored", by=variant)
+        fvsToMappings = defaultdict[int, list[tuple[ast.GlyphClassDefinition, str]]](list)
+        for alias in getAliasesByLocale(locale):
+            charName = getCharNameByAlias(locale, alias)
+            letter = locale + "-" + alias
+            for i in table.select(character=charName, locales=locale):
+                position, fvs = table.joiningPosition(i), table.fvs[i]
+                if fvs != 0:
+                    variant = str(GlyphDescriptor.fromData(charName, position, table.variants[i]))
+                    fvsToMappings[fvs].append((c.classes[letter + "." + position], variant))
+
+        fvsToLookup = dict[int, ast.LookupBlock]()
+        for fvs, mappings in sorted(fvsToMappings.items()):
+            with c.Lookup(f"_.manual.{locale}.fvs{fvs}") as fvsToLookup[fvs]:
+                for glyphClass, variant in mappings:
+                    c.sub(glyphClass, by=variant)
 
         with c.Lookup(f"III.fvs.{locale}", feature="rclt"):
-            for alias in getAliasesByLocale(locale):
-                charName = getCharNameByAlias(locale, alias)
-                letter = locale + "-" + alias
-                for position, variants in data.variants[charName].items():
-                    glyphClass = c.classes[letter + "." + position]
-                    for fvs in variants:
-                        if fvs != 0 and locale in variants[fvs].locales:
-                            c.sub(
-                                c.input(glyphClass, _lvs),
-                                c.input(f"fvs{fvs}.ignored", c.conditions["_.valid"]),
-                                by=None,
-                            )
+            for fvs, mappings in sorted(fvsToMappings.items()):
+                c.sub(
+                    c.input(c.glyphClass([i for i, _ in mappings]), fvsToLookup[fvs]),
+                    c.input(f"fvs{fvs}.ignored", c.conditions["_.valid"]),
+                    by=None,
+                )
 
     if "TOD" in c.locales:
         _lvsManualTod = [
@@ -0,0 +1,250 @@
+import json
+from collections.abc import Callable
+from copy import deepcopy
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Literal
+
+from cattrs import structure
+from fontTools.feaLib import ast
+
+from .. import data
+from ..data.logic import resolveCmapVariants
+from ..data.table import variantTable
+from ..data.types import (
+    FVS,
+    CharacterName,
+    Condition,
+    JoiningPosition,
+    LocaleID,
+    VariantData,
+    VariantLocaleData,
+)
+from . import MongFeaComposer, VariantBuckets
+from .graph import dropUnreachableLookups
+from .iib import ligatureRules
+from .iii import particleLocales, particleRules
+from .subtables import _iterLookups, splitSubtables
+
+Variants = dict[CharacterName, dict[JoiningPosition, dict[FVS, VariantData]]]
+Ligatures = dict[Literal["required", "optional"], dict[str, list[JoiningPosition]]]
+Particles = dict[LocaleID, dict[str, list[FVS]]]
+
+
+@dataclass
+class DataSnapshot:
+    """The data files that change most often, as exported from the TypeScript sources."""
+
+    variants: Variants
+    ligatures: Ligatures
+    particles: Particles
+
+    @classmethod
+    def current(cls) -> "DataSnapshot":
+        """Copy of the data currently loaded in `mongfontbuilder.data`."""
+
+        return cls(deepcopy(data.variants), deepcopy(data.ligatures), deepcopy(data.particles))
+
+    @classmethod
+    def read(cls, directory: Path) -> "DataSnapshot":
+        """Read the JSON files exported to *directory*, e.g. a checkout of `lib/mongfontbuilder/data/`."""
+
+        def load(name: str):
+            with (directory / name).open(encoding="utf-8") as f:
+                return json.load(f)
+
+        return cls(
+            variants=structure(load("variants.json"), Variants),
+            ligatures=load("ligatures.json"),
+            particles=structure(load("particles.json"), Particles),
+        )
+
+    def install(self) -> None:
+        """
+        Load this snapshot into `mongfontbuilder.data`. Dicts are updated in place, so that modules having imported them see the new data.
+        """
+
+        for current, new in [
+            (data.variants, self.variants),
+            (data.ligatures, self.ligatures),
+            (data.particles, self.particles),
+        ]:
+            current.clear()
+            current.update(deepcopy(new))
+        data.codePointToCmapVariant.clear()
+        data.codePointToCmapVariant.update(resolveCmapVariants(data.variants))
+        variantTable.cache_clear()
+
+
+@dataclass
+class DataDiff:
+    characters: set[CharacterName] = field(default_factory=set)
+    """Characters with any changed variant data."""
+    positions: set[tuple[CharacterName, JoiningPosition]] = field(default_factory=set)
+    """Joining positions with any changed variant data."""
+    conditions: set[tuple[LocaleID, Condition]] = field(default_factory=set)
+    """Conditions gaining or losing variants."""
+    structural: set[tuple[CharacterName, JoiningPosition]] = field(default_factory=set)
+    """Joining positions whose changes are not limited to conditions, i.e., change glyph names, FVSes, defaults or locales of variants."""
+    ligatures: bool = False
+    particles: set[LocaleID] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.characters or self.ligatures or self.particles)
+
+    def __str__(self) -> str:
+        return "\n".join(
+            [
+                f"Changed characters: {len(self.characters)}",
+                f"Changed positions: {len(self.positions)}, structurally: {len(self.structural)}",
+                "Changed conditions: " + ", ".join(f"{i}:{j}" for i, j in sorted(self.conditions)),
+                f"Changed ligatures: {self.ligatures}",
+                "Changed particles: " + ", ".join(sorted(self.particles)),
+            ]
+        )
+
+
+def diffData(old: DataSnapshot, new: DataSnapshot) -> DataDiff:
+    """
+    >>> old = DataSnapshot.current()
+    >>> new = deepcopy(old)
+    >>> new.variants["MONGOLIAN LETTER A"]["init"][2].locales["MNG"].conditions.append("chachlag")
+    >>> diff = diffData(old, new)
+    >>> diff.positions, diff.conditions, diff.structural
+    ({('MONGOLIAN LETTER A', 'init')}, {('MNG', 'chachlag')}, set())
+    """
+
+    diff = DataDiff()
+    oldIndices = {k: i for i, k in enumerate(old.variants)}
+    newIndices = {k: i for i, k in enumerate(new.variants)}
+    for charName in oldIndices.keys() | newIndices.keys():
+        oldPositions = old.variants.get(charName, {})
+        newPositions = new.variants.get(charName, {})
+        # Characters and positions are iterated in data order:
+        reordered = oldIndices.get(charName) != newIndices.get(charName)
+        reordered |= [*oldPositions] != [*newPositions]
+        for position in oldPositions.keys() | newPositions.keys():
+            oldVariants = oldPositions.get(position, {})
+            newVariants = newPositions.get(position, {})
+            if reordered or _withoutConditions(oldVariants) != _withoutConditions(newVariants):
+                diff.structural.add((charName, position))
+            elif [*oldVariants.items()] == [*newVariants.items()]:
+                continue
+            diff.characters.add(charName)
+            diff.positions.add((charName, position))
+            changed = _conditions(oldVariants) ^ _conditions(newVariants)
+            diff.conditions.update((locale, condition) for _, locale, condition in changed)
+
+    diff.ligatures = old.ligatures != new.ligatures
+    for locale in {*old.particles, *new.particles}:
+        if [*old.particles.get(locale, {}).items()] != [*new.particles.get(locale, {}).items()]:
+            diff.particles.add(locale)
+    return diff
+
+
+@dataclass
+class Recomposition:
+    composer: MongFeaComposer
+    diff: DataDiff
+    regenerated: list[str]
+    """Names of lookups regenerated in place."""
+    rebuilt: bool
+    """Whether the changes required a full rebuild instead."""
+
+    def __str__(self) -> str:
+        if self.rebuilt:
+            return "Recomposed from scratch"
+        return f"Regenerated lookups: {', '.join(self.regenerated) or 'none'}"
+
+
+def recompose(c: MongFeaComposer, old: DataSnapshot, new: DataSnapshot) -> Recomposition:
+    """
+    Update the composition *c*, composed with *old* data and not pruned since, for *new* data, which is installed into `mongfontbuilder.data`. The result equals composing from scratch with *new* data.
+
+    Only lookups depending on changed data are regenerated, i.e., condition lookups (`{locale}:{condition}`) gaining or losing variants, `IIb.ligature` and the particle lookups `III.particle.{locale}`. Changes to glyph names, FVSes, defaults or locales of variants also affect positional classes, IIa mappings and III rules reading the variant data directly, so they are composed from scratch.
+    """
+
+    diff = diffData(old, new)
+    new.install()
+    regenerated = list[str]()
+    if not diff:
+        return Recomposition(c, diff, regenerated, False)
+
+    lookups = {i.name: i for i in _iterLookups(c.root)}
+    locales = [i for i in particleLocales if i in diff.particles and i in c.locales]
+    # Condition lookups referenced anew may have been dropped as unreachable:
+    if diff.structural or any(f"{i}:particle" not in c.conditions for i in locales):
+        composer = MongFeaComposer(
+            cmap=c.cmap,
+            glyphs=c.glyphs,
+            locales=c.locales,
+            compactGenderHarmony=c.compactGenderHarmony,
+        )
+        composer.compose()
+        return Recomposition(composer, diff, regenerated, True)
+
+    localeToBuckets = dict[LocaleID, VariantBuckets]()
+    for locale, condition in sorted(diff.conditions):
+        name = f"{locale}:{condition}"
+        # Otherwise unknown to the locale or dropped as unreachable, also when composed anew:
+        if lookup := c.conditions.get(name):
+            if locale not in localeToBuckets:
+                localeToBuckets[locale] = c.bucketVariants(locale)
+            buckets = localeToBuckets[locale]
+            _regenerate(c, lookup, lambda: c.conditionRules(locale, condition, buckets))
+            regenerated.append(name)
+
+    if diff.ligatures and (lookup := lookups.get("IIb.ligature")):
+        for name in c.ligatureGlyphs:
+            del c.spec.newGlyphs[name]
+        c.ligatureGlyphs.clear()
+        _regenerate(c, lookup, lambda: ligatureRules(c))
+        regenerated.append(lookup.name)
+
+    for locale in locales:
+        lookup = lookups[f"III.particle.{locale}"]
+        _regenerate(c, lookup, lambda: particleRules(c, locale))
+        regenerated.append(lookup.name)
+
+    dropUnreachableLookups(c)
+    c.oversizedLookups = splitSubtables(c)
+    return Recomposition(c, diff, regenerated, False)
+
+
+def _regenerate(c: MongFeaComposer, lookup: ast.LookupBlock, rules: Callable[[], None]) -> None:
+    # Keep the lookup flags, which `MongFeaComposer.Lookup` always puts first:
+    del lookup.statements[1:]
+    lookup.use_extension = False
+    backup = c.current
+    c.current = lookup.statements
+    try:
+        rules()
+    finally:
+        c.current = backup
+
+
+def _withoutConditions(variants: dict[FVS, VariantData]) -> list:
+    return [
+        (
+            fvs,
+            replace(
+                variant,
+                locales={k: _withoutLocaleConditions(v) for k, v in variant.locales.items()},
+            ),
+        )
+        for fvs, variant in variants.items()
+    ]
+
+
+def _withoutLocaleConditions(data: VariantLocaleData) -> VariantLocaleData:
+    # Annotations only consumed by the documentation:
+    return replace(data, conditions=[], archaic=False, gb="", eac="")
+
+
+def _conditions(variants: dict[FVS, VariantData]) -> set[tuple[FVS, LocaleID, Condition]]:
+    return {
+        (fvs, locale, condition)
+        for fvs, variant in variants.items()
+        for locale, localeData in variant.locales.items()
+        for condition in localeData.conditions
+    }
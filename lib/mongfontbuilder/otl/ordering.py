@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+
+from fontTools.feaLib import ast
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+from ..binary import glyphClassDefFea
+from . import MongFeaComposer, _glyphNames
+
+layoutTables = ["GSUB", "GDEF"]
+
+
+@dataclass
+class GlyphOrderReport:
+    before: dict[str, int]
+    """Table tag -> compiled size in bytes with the original glyph order."""
+    after: dict[str, int]
+    """Table tag -> compiled size in bytes with the optimized glyph order."""
+
+    def __str__(self) -> str:
+        return "\n".join(
+            f"{tag}: {before} -> {self.after[tag]} bytes ({self.after[tag] - before:+})"
+            for tag, before in self.before.items()
+        )
+
+
+def optimizeGlyphOrder(
+    c: MongFeaComposer,
+    glyphOrder: list[str],
+    openTypeCategories: dict[str, str],
+) -> list[str]:
+    """
+    Reorder *glyphOrder* so that members of each glyph class are adjacent, making coverage tables compact ranges instead of long glyph lists.
+
+    Classes are ranked in the order the composer defines them, i.e., by locale, alias and position, and a glyph follows the first class containing it, in the order of variants within that class. Glyphs outside any class keep their original order and come first. Glyphs with a GDEF category from *openTypeCategories* are grouped by category at the end, keeping the GDEF class definition compact as well.
+
+    >>> c = MongFeaComposer(cmap={}, glyphs=[], locales=["MNG"])
+    >>> _ = c.namedGlyphClass("MNG-a.init", ["a.init", "a.init.fvs1"])
+    >>> _ = c.namedGlyphClass("MNG-e.init", ["e.init"])
+    >>> glyphOrder = [".notdef", "e.init", "zwj", "a.init.fvs1", "_A", "a.init"]
+    >>> optimizeGlyphOrder(c, glyphOrder, {"zwj": "mark"})
+    ['.notdef', '_A', 'a.init', 'a.init.fvs1', 'e.init', 'zwj']
+    """
+
+    ranks = dict[str, int]()
+    for definition in c.root:
+        if isinstance(definition, ast.GlyphClassDefinition):
+            for name in _glyphNames(definition.glyphs):
+                ranks.setdefault(name, len(ranks))
+
+    indices = {name: index for index, name in enumerate(glyphOrder)}
+
+    def key(name: str) -> tuple:
+        category = openTypeCategories.get(name, "unassigned")
+        if category == "unassigned":
+            category = ""
+        return name != ".notdef", category, ranks.get(name, -1), indices[name]
+
+    return sorted(glyphOrder, key=key)
+
+
+def measureLayoutTables(
+    c: MongFeaComposer,
+    glyphOrder: list[str],
+    openTypeCategories: dict[str, str],
+    fea: str | None = None,
+) -> dict[str, int]:
+    """
+    Compile the composed features, or *fea* if given, with *glyphOrder* and return compiled sizes of layout tables. Glyph classes in GDEF come from *openTypeCategories*.
+    """
+
+    font = TTFont()
+    font.setGlyphOrder(glyphOrder)
+    fea = fea if fea is not None else c.asFeatureFile().asFea()
+    fea += glyphClassDefFea(openTypeCategories, glyphOrder)
+    addOpenTypeFeaturesFromString(font, fea, tables=layoutTables)
+    return {tag: len(font.getTableData(tag)) for tag in layoutTables if tag in font}
+
+
+def compareGlyphOrders(
+    c: MongFeaComposer,
+    glyphOrder: list[str],
+    openTypeCategories: dict[str, str],
+    fea: str | None = None,
+) -> tuple[list[str], GlyphOrderReport]:
+    """Optimize *glyphOrder* and report sizes of layout tables before and after."""
+
+    optimized = optimizeGlyphOrder(c, glyphOrder, openTypeCategories)
+    report = GlyphOrderReport(
+        measureLayoutTables(c, glyphOrder, openTypeCategories, fea),
+        measureLayoutTables(c, optimized, openTypeCategories, fea),
+    )
+    return optimized, report
@@ -0,0 +1,261 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from fontTools.feaLib import ast
+
+from . import MongFeaComposer, _glyphNames
+from .graph import dropUnreachableLookups
+
+substitutionStatementTypes = (
+    ast.SingleSubstStatement,
+    ast.MultipleSubstStatement,
+    ast.LigatureSubstStatement,
+    ast.ChainContextSubstStatement,
+    ast.IgnoreSubstStatement,
+    ast.ReverseChainSingleSubstStatement,
+)
+
+
+@dataclass
+class PruningReport:
+    glyphs: list[str] = field(default_factory=list)
+    """New glyphs dropped from the spec because of missing components."""
+    classGlyphs: dict[str, list[str]] = field(default_factory=dict)
+    """Glyphs dropped from named glyph classes."""
+    classes: list[str] = field(default_factory=list)
+    """Named glyph classes removed for being empty and unreferenced."""
+    rules: dict[str, int] = field(default_factory=dict)
+    """Numbers of rules dropped from lookups."""
+    lookups: list[str] = field(default_factory=list)
+    """Lookups removed for having no rules left or no longer being referenced."""
+
+    def __str__(self) -> str:
+        lines = [
+            f"dropped {len(self.glyphs)} new glyphs with missing components",
+            f"dropped {sum(len(i) for i in self.classGlyphs.values())} glyphs"
+            f" from {len(self.classGlyphs)} classes, removed {len(self.classes)} empty classes",
+            f"dropped {sum(self.rules.values())} rules"
+            f" from {len(self.rules)} lookups, removed {len(self.lookups)} lookups",
+        ]
+        lines.extend(f"  {name}: -{count}" for name, count in self.rules.items())
+        return "\n".join(lines)
+
+
+def prune(c: MongFeaComposer) -> PruningReport:
+    """
+    Remove composed rules that can’t apply to the final glyph set, i.e., the existing glyphs plus new glyphs in the spec whose components all exist. Named glyph classes shrink accordingly, and classes and lookups that end up empty are removed.
+
+    Only meaningful after `MongFeaComposer.compose` with the actual glyph set of the font. Useful for partial fonts and subset builds.
+    """
+
+    report = PruningReport()
+    glyphSet = _resolveGlyphSet(c, report)
+    pruner = _Pruner(glyphSet, report)
+
+    pruner.pruneRules(c.root)
+    emptyLookups = pruner.emptyLookups
+    report.lookups.extend(i.name for i in emptyLookups)
+    pruner.removeLookups(c.root, emptyLookups)
+    for name in [k for k, v in c.conditions.items() if v in emptyLookups]:
+        del c.conditions[name]
+    report.lookups.extend(dropUnreachableLookups(c))
+
+    pruner.pruneClasses(c.root)
+    referenced = set[int]()
+    _collectClassReferences(c.root, referenced)
+    emptyClasses = [
+        i
+        for i in _iterClassDefinitions(c.root)
+        if not _glyphNames(i.glyphs) and id(i) not in referenced
+    ]
+    report.classes.extend(i.name for i in emptyClasses)
+    _removeStatements(c.root, {id(i) for i in emptyClasses})
+    for name in [k for k, v in c.classes.items() if v in emptyClasses]:
+        del c.classes[name]
+
+    return report
+
+
+def _resolveGlyphSet(c: MongFeaComposer, report: PruningReport) -> set[str]:
+    glyphSet = {*c.glyphs}
+    pending = dict(c.spec.newGlyphs)
+    while resolved := [
+        k for k, v in pending.items() if all(i in glyphSet for i in v.components)
+    ]:
+        for name in resolved:
+            glyphSet.add(name)
+            del pending[name]
+
+    for name in pending:
+        report.glyphs.append(name)
+        del c.spec.newGlyphs[name]
+        c.spec.openTypeCategories.pop(name, None)
+    for codePoint in [k for k, v in c.spec.cmap.items() if v in pending]:
+        del c.spec.cmap[codePoint]
+
+    return glyphSet
+
+
+class _Pruner:
+    glyphSet: set[str]
+    report: PruningReport
+    emptyLookups: list[ast.LookupBlock]
+
+    def __init__(self, glyphSet: set[str], report: PruningReport) -> None:
+        self.glyphSet = glyphSet
+        self.report = report
+        self.emptyLookups = []
+
+    def pruneRules(self, statements: list[ast.Statement], lookup: str = "") -> None:
+        for index, statement in reversed([*enumerate(statements)]):
+            if isinstance(statement, ast.LookupBlock):
+                self.pruneRules(statement.statements, statement.name)
+                if not any(isinstance(i, substitutionStatementTypes) for i in statement.statements):
+                    self.emptyLookups.append(statement)
+            elif isinstance(statement, ast.FeatureBlock):
+                self.pruneRules(statement.statements, statement.name)
+            elif isinstance(statement, ast.LookupFlagStatement):
+                if isinstance(statement.markFilteringSet, ast.GlyphClass):
+                    self.pruneGlyphClass(statement.markFilteringSet)
+            elif isinstance(statement, substitutionStatementTypes):
+                if not self.pruneRule(statement):
+                    del statements[index]
+                    self.report.rules[lookup] = self.report.rules.get(lookup, 0) + 1
+
+    def pruneRule(self, statement: ast.Statement) -> bool:
+        """Prune inline glyph classes of *statement* and return whether it can still apply."""
+
+        if isinstance(statement, ast.IgnoreSubstStatement):
+            statement.chainContexts = [
+                i for i in statement.chainContexts if all(self.pruneSlots(j) for j in i)
+            ]
+            return bool(statement.chainContexts)
+
+        if isinstance(statement, ast.SingleSubstStatement):
+            context = [statement.prefix, statement.suffix]
+            return self.pruneSlots(*context) and self.prunePairs(
+                statement.glyphs, statement.replacements
+            )
+        elif isinstance(statement, ast.ReverseChainSingleSubstStatement):
+            context = [statement.old_prefix, statement.old_suffix]
+            return self.pruneSlots(*context) and self.prunePairs(
+                statement.glyphs, statement.replacements
+            )
+        elif isinstance(statement, ast.MultipleSubstStatement):
+            slots = [statement.prefix, [statement.glyph], statement.suffix]
+            return self.pruneSlots(*slots) and self.pruneSlots(statement.replacement)
+        elif isinstance(statement, ast.LigatureSubstStatement):
+            slots = [statement.prefix, statement.glyphs, statement.suffix]
+            return self.pruneSlots(*slots) and self.pruneSlots([statement.replacement])
+        else:
+            assert isinstance(statement, ast.ChainContextSubstStatement), statement
+            slots = [statement.prefix, statement.glyphs, statement.suffix]
+            return self.pruneSlots(*slots)
+
+    def pruneSlots(self, *slots: Iterable) -> bool:
+        """Prune inline glyph classes in *slots* and return whether none of them is empty."""
+
+        applicable = True
+        for slot in slots:
+            for glyph in slot:
+                if isinstance(glyph, ast.GlyphClass):
+                    self.pruneGlyphClass(glyph)
+                if not any(i in self.glyphSet for i in _glyphNames(glyph)):
+                    applicable = False
+        return applicable
+
+    def prunePairs(self, glyphs: list, replacements: list) -> bool:
+        """Prune single substitution pairs and return whether any is left."""
+
+        [input], [output] = glyphs, replacements
+        inputs, outputs = _glyphNames(input), _glyphNames(output)
+        if len(outputs) == 1:
+            return self.pruneSlots([input], [output])
+
+        pairs = [*zip(inputs, outputs)]
+        kept = [(i, o) for i, o in pairs if i in self.glyphSet and o in self.glyphSet]
+        if len(kept) < len(pairs):
+            glyphs[0] = ast.GlyphClass([ast.GlyphName(i) for i, _ in kept])
+            replacements[0] = ast.GlyphClass([ast.GlyphName(o) for _, o in kept])
+        return bool(kept)
+
+    def pruneGlyphClass(self, glyphClass: ast.GlyphClass) -> list[str]:
+        """Prune *glyphClass* in place and return names of directly dropped glyphs."""
+
+        kept = list[ast.Expression]()
+        dropped = list[str]()
+        for glyph in glyphClass.glyphs:
+            if isinstance(glyph, ast.GlyphClass):
+                self.pruneGlyphClass(glyph)
+            names = _glyphNames(glyph)
+            if any(i in self.glyphSet for i in names):
+                kept.append(glyph)
+            elif isinstance(glyph, (str, ast.GlyphName)):
+                dropped.extend(names)
+        glyphClass.glyphs = kept
+        return dropped
+
+    def pruneClasses(self, statements: list[ast.Statement]) -> None:
+        for definition in _iterClassDefinitions(statements):
+            if dropped := self.pruneGlyphClass(definition.glyphs):
+                self.report.classGlyphs[definition.name] = dropped
+
+    def removeLookups(
+        self,
+        statements: list[ast.Statement],
+        lookups: list[ast.LookupBlock],
+    ) -> None:
+        ids = {id(i) for i in lookups}
+        for index, statement in reversed([*enumerate(statements)]):
+            if isinstance(statement, ast.LookupReferenceStatement) and id(statement.lookup) in ids:
+                del statements[index]
+            elif isinstance(statement, ast.ChainContextSubstStatement):
+                statement.lookups = [
+                    [j for j in i if id(j) not in ids] or None if i else None
+                    for i in statement.lookups
+                ]
+                if not any(statement.lookups):
+                    # Still matches and blocks subsequent rules, like before:
+                    context = statement.prefix, statement.glyphs, statement.suffix
+                    statements[index] = ast.IgnoreSubstStatement([context])
+            elif isinstance(statement, (ast.LookupBlock, ast.FeatureBlock)):
+                self.removeLookups(statement.statements, lookups)
+                if id(statement) in ids:
+                    del statements[index]
+                elif isinstance(statement, ast.FeatureBlock) and not any(
+                    isinstance(i, (ast.LookupBlock, ast.LookupReferenceStatement))
+                    or isinstance(i, substitutionStatementTypes)
+                    for i in statement.statements
+                ):
+                    del statements[index]
+
+
+def _iterClassDefinitions(statements: list[ast.Statement]) -> Iterable[ast.GlyphClassDefinition]:
+    for statement in statements:
+        if isinstance(statement, ast.GlyphClassDefinition):
+            yield statement
+        elif isinstance(statement, ast.Block):
+            yield from _iterClassDefinitions(statement.statements)
+
+
+def _collectClassReferences(element, referenced: set[int]) -> None:
+    """Collect ids of glyph class definitions referenced by *element* and its descendants."""
+
+    if isinstance(element, ast.GlyphClassName):
+        referenced.add(id(element.glyphclass))
+    elif isinstance(element, (list, tuple)):
+        for i in element:
+            _collectClassReferences(i, referenced)
+    elif isinstance(element, ast.Element):
+        for key, value in vars(element).items():
+            # Referenced lookups are visited where they are defined:
+            if key not in ["lookup", "lookups"]:
+                _collectClassReferences(value, referenced)
+
+
+def _removeStatements(statements: list[ast.Statement], ids: set[int]) -> None:
+    for index, statement in reversed([*enumerate(statements)]):
+        if id(statement) in ids:
+            del statements[index]
+        elif isinstance(statement, ast.Block):
+            _removeStatements(statement.statements, ids)
@@ -0,0 +1,127 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from fontTools.feaLib import ast
+
+from . import MongFeaComposer, _glyphNames
+
+subtableBudget = 0xC000
+"""
+Estimated size in bytes above which a subtable is split or a lookup is turned into an extension lookup, leaving a margin below the 0xFFFF reach of 16-bit offsets for estimation errors.
+"""
+
+
+@dataclass
+class LookupSize:
+    name: str
+    size: int
+    """Estimated size in bytes of the lookup and its subtables."""
+    subtables: int
+    """Estimated number of subtables."""
+
+    def __str__(self) -> str:
+        return f"{self.name}: ~{self.size} bytes in {self.subtables} subtables"
+
+
+def splitSubtables(c: MongFeaComposer, budget: int = subtableBudget) -> list[LookupSize]:
+    """
+    Estimate subtable sizes of composed lookups, insert `subtable;` breaks where merged subtables would exceed *budget*, and turn lookups exceeding *budget* as a whole into extension lookups. Return the sizes of these at-risk lookups.
+
+    This keeps fontTools from falling back to its slow, iterative overflow resolution when compiling large lookups.
+    """
+
+    atRisk = list[LookupSize]()
+    for lookup in _iterLookups(c.root):
+        size = _splitLookup(lookup, budget)
+        if size.size > budget:
+            lookup.use_extension = True
+            atRisk.append(size)
+    return atRisk
+
+
+def estimateRuleSize(statement: ast.Statement) -> int:
+    """
+    Estimated bytes a rule adds to its subtable, not counting the subtable header. Coverage tables are assumed to be in format 1 and not shared.
+
+    >>> glyphs = ast.GlyphClass([ast.GlyphName("a"), ast.GlyphName("b")])
+    >>> estimateRuleSize(ast.SingleSubstStatement([glyphs], [glyphs], [], [], False))
+    8
+    >>> estimateRuleSize(ast.ChainContextSubstStatement([glyphs], [glyphs], [], [None]))
+    20
+    """
+
+    if isinstance(statement, ast.SingleSubstStatement):
+        # Coverage and substitute glyph IDs:
+        return 4 * len(_glyphNames(statement.glyphs[0]))
+    elif isinstance(statement, ast.MultipleSubstStatement):
+        # Coverage, sequence offset, and sequence:
+        return 4 + 2 + 2 * len(statement.replacement)
+    elif isinstance(statement, ast.LigatureSubstStatement):
+        # Coverage, ligature set offset and count, ligature offset, and ligature:
+        return 2 + 4 + 2 + 4 + 2 * (len(statement.glyphs) - 1)
+    elif isinstance(statement, ast.ChainContextSubstStatement):
+        slots = [*statement.prefix, *statement.glyphs, *statement.suffix]
+        records = sum(len(i) for i in statement.lookups if i)
+        return _contextSize(slots) + 4 * records
+    elif isinstance(statement, ast.IgnoreSubstStatement):
+        return sum(
+            _contextSize([*prefix, *glyphs, *suffix])
+            for prefix, glyphs, suffix in statement.chainContexts
+        )
+    elif isinstance(statement, ast.ReverseChainSingleSubstStatement):
+        slots = [*statement.old_prefix, *statement.glyphs, *statement.old_suffix]
+        return _contextSize(slots) + 2 * len(_glyphNames(statement.glyphs[0]))
+    return 0
+
+
+mergedStatementTypes = (
+    ast.SingleSubstStatement,
+    ast.MultipleSubstStatement,
+    ast.LigatureSubstStatement,
+)
+"""Rules that fontTools merges into shared subtables until the next `subtable;` break."""
+
+subtableHeaderSize = 10
+lookupHeaderSize = 8
+
+
+def _splitLookup(lookup: ast.LookupBlock, budget: int) -> LookupSize:
+    size = lookupHeaderSize
+    subtables = 0
+    current = 0
+    for index, statement in reversed([*enumerate(lookup.statements)]):
+        # Reversed so that inserting breaks keeps pending indices valid:
+        if isinstance(statement, ast.SubtableStatement):
+            current = 0
+        elif isinstance(statement, mergedStatementTypes):
+            ruleSize = estimateRuleSize(statement)
+            if current and current + ruleSize > budget:
+                lookup.statements.insert(index + 1, ast.SubtableStatement())
+                current = 0
+            if not current:
+                current = subtableHeaderSize
+                subtables += 1
+                size += 2 + subtableHeaderSize
+            current += ruleSize
+            size += ruleSize
+        elif isinstance(statement, ast.Statement) and (ruleSize := estimateRuleSize(statement)):
+            # Each contextual rule is compiled into its own format 3 subtable:
+            count = 1
+            if isinstance(statement, ast.IgnoreSubstStatement):
+                count = len(statement.chainContexts)
+            subtables += count
+            size += (2 + subtableHeaderSize) * count + ruleSize
+    return LookupSize(lookup.name, size, subtables)
+
+
+def _contextSize(slots: list) -> int:
+    # Coverage offset and coverage table for each slot:
+    return sum(2 + 4 + 2 * len(_glyphNames(i)) for i in slots)
+
+
+def _iterLookups(statements: list[ast.Statement]) -> Iterable[ast.LookupBlock]:
+    for statement in statements:
+        if isinstance(statement, ast.LookupBlock):
+            yield statement
+        elif isinstance(statement, ast.FeatureBlock):
+            yield from _iterLookups(statement.statements)
@@ -0,0 +1,108 @@
+from collections.abc import Iterable
+from os import environ
+from pathlib import Path
+
+from fontTools.ttLib import TTFont
+from ufo2ft import OTFCompiler
+from ufo2ft.constants import CFFOptimization
+from ufoLib2 import Font
+
+from .data.types import LocaleID
+from .lookupcache import LookupCache, cachingFeatureCompilerClass
+from .otl import MongFeaComposer
+from .otl.cache import composeCached
+from .spec import applySpecToFont, readGlyphInventory, saveFontIncrementally
+
+outputSuffixes = [".ufo", ".otf"]
+
+
+def composeFont(
+    input: str | Path,
+    locales: list[LocaleID],
+    compactGenderHarmony: bool = False,
+) -> tuple[Font, MongFeaComposer]:
+    """
+    Open the UFO at *input* and apply the composition for *locales* to it in memory, with glyphs loaded lazily.
+    """
+
+    cmap, glyphs = readGlyphInventory(input)
+    c = MongFeaComposer(
+        cmap=cmap, glyphs=glyphs, locales=locales, compactGenderHarmony=compactGenderHarmony
+    )
+    spec = c.compose()
+    font = Font.open(input)
+    applySpecToFont(spec, font, lazy=True)
+    font.features.text = c.asFeatureFile().asFea()
+    return font, c
+
+
+def compileOTF(
+    font: Font,
+    featureWriters: list | None = None,
+    lookupCache: LookupCache | None = None,
+) -> TTFont:
+    """
+    Compile *font* in memory, with feaLib’s lookup debugging info for shaping tools. With *lookupCache*, lookups compiled before are reused.
+    """
+
+    environ["FONTTOOLS_LOOKUP_DEBUGGING"] = "1"  # For feaLib.builder.Builder
+    options = {}
+    if lookupCache is not None:
+        options["featureCompilerClass"] = cachingFeatureCompilerClass(lookupCache)
+    compiler = OTFCompiler(
+        useProductionNames=False,
+        optimizeCFF=CFFOptimization.NONE,
+        featureWriters=featureWriters,
+        **options,
+    )
+    return compiler.compile(font)
+
+
+def writeOutputs(
+    font: Font,
+    outputs: Iterable[str | Path],
+    featureWriters: list | None = None,
+    lookupCache: LookupCache | None = None,
+) -> None:
+    """
+    Write *font* to every path in *outputs*, each a `.ufo` or `.otf`. The binary is compiled once from the same in-memory font, without an intermediate UFO on disk, and glyphs are still loaded lazily.
+    """
+
+    outputs = [Path(i) for i in outputs]
+    for output in outputs:
+        if output.suffix.lower() not in outputSuffixes:
+            msg = f"unsupported output format: {output.suffix} (use .ufo or .otf)"
+            raise ValueError(msg)
+        output.parent.mkdir(parents=True, exist_ok=True)
+    ufos = [i for i in outputs if i.suffix.lower() == ".ufo"]
+    otfs = [i for i in outputs if i.suffix.lower() == ".otf"]
+
+    if otfs:
+        otf = compileOTF(font, featureWriters, lookupCache)
+        for output in otfs:
+            otf.save(output)
+    for output in ufos:
+        saveFontIncrementally(font, output)
+
+
+def buildFont(
+    input: str | Path,
+    locales: list[LocaleID],
+    outputs: Iterable[str | Path],
+    cacheDir: Path | None = None,
+    lookupCache: LookupCache | None = None,
+    compactGenderHarmony: bool = False,
+) -> None:
+    """
+    Compose the UFO at *input* for *locales* and write all *outputs* from one composition. With *cacheDir*, the composition is reused as long as the glyph names, the cmap, the locales, the options and the package stay the same. With *lookupCache*, unchanged lookups are not compiled again.
+    """
+
+    if cacheDir is None:
+        font, _ = composeFont(input, locales, compactGenderHarmony)
+    else:
+        cmap, glyphs = readGlyphInventory(input)
+        spec, fea = composeCached(cmap, glyphs, locales, cacheDir, compactGenderHarmony)
+        font = Font.open(input)
+        applySpecToFont(spec, font, lazy=True)
+        font.features.text = fea
+    writeOutputs(font, outputs, lookupCache=lookupCache)
@@ -0,0 +1,516 @@
+"""
+Shaping tools for compiled fonts. Requires `uharfbuzz`.
+
+uv run python -m mongfontbuilder.shaping diff before.otf after.otf corpus.txt [...]
+uv run python -m mongfontbuilder.shaping profile font.otf corpus.txt [...]
+uv run python -m mongfontbuilder.shaping benchmark before.otf after.otf corpus.txt [...]
+"""
+
+from __future__ import annotations
+
+import json
+from argparse import ArgumentParser
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from functools import cache
+from hashlib import sha256
+from pathlib import Path
+from time import perf_counter
+
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import otTables
+
+CHUNK_SIZE = 256
+
+
+@cache
+def loadFont(path: Path):  # -> uharfbuzz.Font
+    from uharfbuzz import Blob, Face, Font  # type: ignore
+
+    return Font(Face(Blob.from_file_path(path)))
+
+
+def shape(font: Path, text: str) -> list[str]:
+    """Shape *text* with *font* and return the resulting glyph names."""
+
+    from uharfbuzz import Buffer  # type: ignore
+    from uharfbuzz import shape as hbShape  # type: ignore
+
+    hbFont = loadFont(font)
+    buffer = Buffer()
+    buffer.add_str(text)
+    buffer.guess_segment_properties()
+    hbShape(hbFont, buffer)
+    return [hbFont.glyph_to_string(info.codepoint) for info in buffer.glyph_infos]
+
+
+def shapeTexts(font: Path, texts: list[str]) -> list[list[str]]:
+    return [shape(font, text) for text in texts]
+
+
+def fontHash(font: Path) -> str:
+    return sha256(font.read_bytes()).hexdigest()
+
+
+def readCorpus(paths: Iterable[Path]) -> list[str]:
+    """Read strings from text files, one per line. Empty lines are skipped."""
+
+    texts = list[str]()
+    for path in paths:
+        with path.open(encoding="utf-8") as f:
+            texts.extend(line for i in f if (line := i.rstrip("\r\n")))
+    return texts
+
+
+class ShapingCache:
+    """
+    Shaping results of a font, persisted in *directory* as a JSON file named after the hash of the font file. Without *directory*, results are only kept in memory.
+    """
+
+    font: Path
+    path: Path | None
+    results: dict[str, list[str]]
+
+    def __init__(self, font: Path, directory: Path | None = None) -> None:
+        from uharfbuzz import version_string  # type: ignore
+
+        self.font = font
+        self.path = directory / f"{fontHash(font)}.json" if directory else None
+        self.results = {}
+        self._harfBuzzVersion: str = version_string()
+        self._dirty = False
+
+        if self.path and self.path.exists():
+            content = json.loads(self.path.read_text(encoding="utf-8"))
+            if content.get("harfbuzz") == self._harfBuzzVersion:
+                self.results = content["results"]
+
+    def update(self, results: dict[str, list[str]]) -> None:
+        self.results.update(results)
+        self._dirty = True
+
+    def save(self) -> None:
+        if self.path and self._dirty:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            content = {"harfbuzz": self._harfBuzzVersion, "results": self.results}
+            self.path.write_text(json.dumps(content, ensure_ascii=False), encoding="utf-8")
+            self._dirty = False
+
+
+@dataclass
+class ShapingDifference:
+    text: str
+    before: list[str]
+    after: list[str]
+
+
+def diffShaping(
+    before: Path,
+    after: Path,
+    texts: Iterable[str],
+    *,
+    jobs: int | None = None,
+    maxDifferences: int | None = None,
+    cacheDir: Path | None = None,
+) -> list[ShapingDifference]:
+    """
+    Shape *texts* with both fonts and return the strings whose glyph sequences differ, in corpus order.
+
+    Shaping is distributed over *jobs* worker processes (all CPUs by default, inline if 1). With *maxDifferences*, remaining work is cancelled once that many differences are found. With *cacheDir*, each font’s shaping results are cached on disk, keyed by the font’s hash, so that only uncached strings are shaped again.
+    """
+
+    texts = [*dict.fromkeys(texts)]
+    caches = [ShapingCache(before, cacheDir), ShapingCache(after, cacheDir)]
+    differences = dict[str, ShapingDifference]()
+
+    def compare(candidates: Iterable[str]) -> bool:
+        """Record differences among *candidates* and return whether to stop."""
+
+        for text in candidates:
+            results = [i.results.get(text) for i in caches]
+            if None in results:
+                continue
+            if results[0] != results[1]:
+                differences[text] = ShapingDifference(text, *results)  # type: ignore
+                if maxDifferences is not None and len(differences) >= maxDifferences:
+                    return True
+        return False
+
+    try:
+        if compare(texts):
+            return _ordered(differences, texts)
+
+        chunks = list[tuple[ShapingCache, list[str]]]()
+        for start in range(0, len(texts), CHUNK_SIZE):
+            chunk = texts[start : start + CHUNK_SIZE]
+            for shapingCache in caches:
+                if missing := [i for i in chunk if i not in shapingCache.results]:
+                    chunks.append((shapingCache, missing))
+
+        if jobs == 1:
+            for shapingCache, chunk in chunks:
+                shapingCache.update(dict(zip(chunk, shapeTexts(shapingCache.font, chunk))))
+                if compare(chunk):
+                    break
+        else:
+            with ProcessPoolExecutor(jobs) as executor:
+                futureToChunk = dict[Future[list[list[str]]], tuple[ShapingCache, list[str]]]()
+                for shapingCache, chunk in chunks:
+                    future = executor.submit(shapeTexts, shapingCache.font, chunk)
+                    futureToChunk[future] = shapingCache, chunk
+                pending = {*futureToChunk}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    stop = False
+                    for future in done:
+                        shapingCache, chunk = futureToChunk[future]
+                        shapingCache.update(dict(zip(chunk, future.result())))
+                        # Results are still cached, but not compared past the limit:
+                        stop = stop or compare(chunk)
+                    if stop:
+                        for future in pending:
+                            future.cancel()
+                        break
+    finally:
+        for shapingCache in caches:
+            shapingCache.save()
+
+    return _ordered(differences, texts)
+
+
+def _ordered(
+    differences: dict[str, ShapingDifference],
+    texts: list[str],
+) -> list[ShapingDifference]:
+    return [differences[i] for i in texts if i in differences]
+
+
+def benchmarkShaping(font: Path, texts: list[str], *, repeat: int = 5) -> float:
+    """
+    Return the best time in seconds, out of *repeat* runs, of shaping all *texts* with *font* in this process. One buffer is reused, so that the time is spent in HarfBuzz rather than in Python.
+    """
+
+    from uharfbuzz import Buffer  # type: ignore
+    from uharfbuzz import shape as hbShape  # type: ignore
+
+    hbFont = loadFont(font)
+    buffer = Buffer()
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for text in texts:
+            buffer.clear_contents()
+            buffer.add_str(text)
+            buffer.guess_segment_properties()
+            hbShape(hbFont, buffer)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+@dataclass
+class LookupProfile:
+    """
+    How many strings of a corpus a lookup was applied to, and how many of them it changed.
+
+    A lookup applied directly by a feature counts as applied unless HarfBuzz skips it for having no matching glyph in the buffer. A nested lookup, e.g. a condition lookup referenced by a contextual rule, is only observable through its changes, so it counts as applied when a change by its referencing lookup matches its mapping.
+    """
+
+    table: str
+    index: int
+    name: str
+    nested: bool = False
+    applied: int = 0
+    changed: int = 0
+
+
+@dataclass
+class _LookupMetadata:
+    names: dict[tuple[str, int], str | None]
+    nested: dict[tuple[str, int], list[int]]
+    mappings: dict[tuple[str, int], dict[str, tuple[str, ...]]]
+
+
+@cache
+def _loadLookupMetadata(font: Path) -> _LookupMetadata:
+    """
+    Lookup names are available if the font was compiled with `FONTTOOLS_LOOKUP_DEBUGGING=1`.
+    """
+
+    ttFont = TTFont(font)
+    metadata = _LookupMetadata({}, {}, {})
+    debugging = (
+        ttFont["Debg"].data.get("com.github.fonttools.feaLib", {}) if "Debg" in ttFont else {}
+    )
+    for tag in ["GSUB", "GPOS"]:
+        if tag not in ttFont:
+            continue
+        table = ttFont[tag].table
+        names = debugging.get(tag, {})
+        for index, lookup in enumerate(table.LookupList.Lookup if table.LookupList else []):
+            key = tag, index
+            _, metadata.names[key], _ = names.get(str(index), (None, f"lookup {index}", None))
+            for subtable in lookup.SubTable:
+                if isinstance(subtable, (otTables.ExtensionSubst, otTables.ExtensionPos)):
+                    subtable = subtable.ExtSubTable
+                if isinstance(subtable, otTables.SingleSubst):
+                    mapping = {k: (v,) for k, v in subtable.mapping.items()}
+                    metadata.mappings.setdefault(key, {}).update(mapping)
+                elif isinstance(subtable, otTables.MultipleSubst):
+                    mapping = {k: tuple(v) for k, v in subtable.mapping.items()}
+                    metadata.mappings.setdefault(key, {}).update(mapping)
+                for record in _iterLookupRecords(subtable):
+                    nested = metadata.nested.setdefault(key, [])
+                    if record.LookupListIndex not in nested:
+                        nested.append(record.LookupListIndex)
+
+    # Anonymous lookups are generated by feaLib for inline substitutions in contextual rules:
+    for (tag, index), nested in metadata.nested.items():
+        for i in nested:
+            if metadata.names.get((tag, i)) is None:
+                metadata.names[tag, i] = metadata.names[tag, index] + " (inline)"
+    return metadata
+
+
+def _iterLookupRecords(table: otTables.BaseTable):
+    for entry in table.iterSubTables():
+        if isinstance(entry.value, (otTables.SubstLookupRecord, otTables.PosLookupRecord)):
+            yield entry.value
+        else:
+            yield from _iterLookupRecords(entry.value)
+
+
+def profileTexts(font: Path, texts: list[str]) -> dict[tuple[str, int], tuple[int, int]]:
+    """Return applied and changed counts of lookups, keyed by table tag and lookup index."""
+
+    from uharfbuzz import Buffer  # type: ignore
+    from uharfbuzz import shape as hbShape  # type: ignore
+
+    hbFont = loadFont(font)
+    metadata = _loadLookupMetadata(font)
+    counts = dict[tuple[str, int], tuple[int, int]]()
+
+    for text in texts:
+        buffer = Buffer()
+        buffer.add_str(text)
+        buffer.guess_segment_properties()
+
+        applied = set[tuple[str, int]]()
+        changed = set[tuple[str, int]]()
+        state = {"table": "GSUB", "before": None, "skipped": False}
+
+        def snapshot() -> list[str]:
+            return [hbFont.glyph_to_string(i.codepoint) for i in buffer.glyph_infos]
+
+        def callback(message: str) -> bool:
+            if message.startswith("start table "):
+                state["table"] = message.split()[2]
+            elif message.startswith("start lookup "):
+                state["before"], state["skipped"] = snapshot(), False
+            elif message.startswith("skipped lookup "):
+                state["skipped"] = True
+            elif message.startswith("end lookup ") and not state["skipped"]:
+                key = state["table"], int(message.split()[2])
+                applied.add(key)
+                before, after = state["before"], snapshot()
+                if before != after:
+                    changed.add(key)
+                    for nestedKey in _attributeNestedChanges(metadata, key, before, after):
+                        applied.add(nestedKey)
+                        changed.add(nestedKey)
+            return True
+
+        buffer.set_message_func(callback)
+        hbShape(hbFont, buffer)
+
+        for key in applied:
+            appliedCount, changedCount = counts.get(key, (0, 0))
+            counts[key] = appliedCount + 1, changedCount + (key in changed)
+
+    return counts
+
+
+def _attributeNestedChanges(
+    metadata: _LookupMetadata,
+    key: tuple[str, int],
+    before: list[str],
+    after: list[str],
+) -> set[tuple[str, int]]:
+    attributed = set[tuple[str, int]]()
+    if key not in metadata.nested:
+        return attributed
+    for operation, i1, i2, j1, j2 in SequenceMatcher(None, before, after).get_opcodes():
+        substitutions = list[tuple[str, tuple[str, ...]]]()
+        if operation == "replace" and i2 - i1 == j2 - j1:
+            substitutions.extend((old, (new,)) for old, new in zip(before[i1:i2], after[j1:j2]))
+        elif operation == "replace" and i2 - i1 == 1:
+            substitutions.append((before[i1], tuple(after[j1:j2])))
+        elif operation == "insert":
+            # The expanded glyph is aligned either before or after the inserted ones:
+            if i1 > 0:
+                substitutions.append((before[i1 - 1], (before[i1 - 1], *after[j1:j2])))
+            if i1 < len(before):
+                substitutions.append((before[i1], (*after[j1:j2], before[i1])))
+        for old, new in substitutions:
+            attributed.update(_findSubstitutingLookups(metadata, key, old, new))
+    return attributed
+
+
+def _findSubstitutingLookups(
+    metadata: _LookupMetadata,
+    key: tuple[str, int],
+    old: str,
+    new: tuple[str, ...],
+) -> list[tuple[str, int]]:
+    """Find the chain of lookups nested in *key* that substitutes *old* with *new*."""
+
+    tag, _ = key
+    for index in metadata.nested.get(key, []):
+        candidate = tag, index
+        if metadata.mappings.get(candidate, {}).get(old) == new:
+            return [candidate]
+        if candidate != key and (chain := _findSubstitutingLookups(metadata, candidate, old, new)):
+            return [candidate, *chain]
+    return []
+
+
+def profileLookups(
+    font: Path,
+    texts: Iterable[str],
+    *,
+    jobs: int | None = None,
+) -> list[LookupProfile]:
+    """
+    Shape *texts* with *font* and return profiles of all its lookups, ranked by how often they changed the buffer and then by how often they were applied. Lookups never applied are kept at the end as candidates for removal.
+    """
+
+    texts = [*texts]
+    metadata = _loadLookupMetadata(font)
+    chunks = [texts[i : i + CHUNK_SIZE] for i in range(0, len(texts), CHUNK_SIZE)]
+    if jobs == 1:
+        results = [profileTexts(font, i) for i in chunks]
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = [*executor.map(profileTexts, [font] * len(chunks), chunks)]
+
+    nestedKeys = {(tag, i) for (tag, _), v in metadata.nested.items() for i in v}
+    profiles = {
+        key: LookupProfile(*key, name or "", nested=key in nestedKeys)
+        for key, name in metadata.names.items()
+    }
+    for counts in results:
+        for key, (applied, changed) in counts.items():
+            profile = profiles[key]
+            profile.applied += applied
+            profile.changed += changed
+
+    return sorted(profiles.values(), key=lambda x: (-x.changed, -x.applied, x.table, x.index))
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = ArgumentParser(prog="python -m mongfontbuilder.shaping")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    diffParser = subparsers.add_parser(
+        "diff",
+        help="report strings whose glyph sequences differ between two fonts",
+    )
+    diffParser.add_argument("before", type=Path, help="path to the font before the change")
+    diffParser.add_argument("after", type=Path, help="path to the font after the change")
+    diffParser.add_argument(
+        "corpus",
+        type=Path,
+        nargs="+",
+        help="paths to text files to read strings from, one per line",
+    )
+    diffParser.add_argument(
+        "--jobs",
+        type=int,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+    diffParser.add_argument(
+        "--max-differences",
+        metavar="N",
+        type=int,
+        help="stop after N differences are found",
+    )
+    diffParser.add_argument(
+        "--cache",
+        metavar="DIR",
+        type=Path,
+        help="directory to cache shaping results in, keyed by font hash",
+    )
+
+    profileParser = subparsers.add_parser(
+        "profile",
+        help="report how often each lookup is applied and changes the buffer",
+    )
+    profileParser.add_argument("font", type=Path, help="path to the compiled font")
+    profileParser.add_argument(
+        "corpus",
+        type=Path,
+        nargs="+",
+        help="paths to text files to read strings from, one per line",
+    )
+    profileParser.add_argument(
+        "--jobs",
+        type=int,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+
+    benchmarkParser = subparsers.add_parser(
+        "benchmark",
+        help="compare how long two fonts take to shape a corpus",
+    )
+    benchmarkParser.add_argument("before", type=Path, help="path to the font before the change")
+    benchmarkParser.add_argument("after", type=Path, help="path to the font after the change")
+    benchmarkParser.add_argument(
+        "corpus",
+        type=Path,
+        nargs="+",
+        help="paths to text files to read strings from, one per line",
+    )
+    benchmarkParser.add_argument(
+        "--repeat",
+        metavar="N",
+        type=int,
+        default=5,
+        help="number of runs per font, of which the fastest is reported",
+    )
+
+    parsed = parser.parse_args(args)
+    if parsed.command == "benchmark":
+        texts = readCorpus(parsed.corpus)
+        before, after = (
+            benchmarkShaping(i, texts, repeat=parsed.repeat) for i in [parsed.before, parsed.after]
+        )
+        print(f"{parsed.before}: {before:.3f} s ({len(texts)} strings)")
+        print(f"{parsed.after}: {after:.3f} s ({after / before - 1:+.1%})")
+        return 0
+    if parsed.command == "profile":
+        texts = readCorpus(parsed.corpus)
+        print(f"{'changed':>8} {'applied':>8}  lookup ({len(texts)} strings)")
+        for profile in profileLookups(parsed.font, texts, jobs=parsed.jobs):
+            nested = " (nested)" if profile.nested else ""
+            location = f"{profile.table} {profile.index}"
+            print(f"{profile.changed:>8} {profile.applied:>8}  {profile.name} [{location}]{nested}")
+        return 0
+
+    differences = diffShaping(
+        parsed.before,
+        parsed.after,
+        readCorpus(parsed.corpus),
+        jobs=parsed.jobs,
+        maxDifferences=parsed.max_differences,
+        cacheDir=parsed.cache,
+    )
+    for difference in differences:
+        print(difference.text)
+        print("-", " ".join(difference.before))
+        print("+", " ".join(difference.after))
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
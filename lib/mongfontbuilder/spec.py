@@ -1,8 +1,12 @@
 from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
 from typing import Literal
 
 from fontTools.misc.transform import Transform
-from ufoLib2.objects import Component, Font
+from fontTools.ufoLib import UFOReader, UFOWriter
+from fontTools.ufoLib.glifLib import GlyphSet
+from ufoLib2.objects import Component, Font, Layer
 
 
 @dataclass
@@ -19,17 +23,39 @@ class FontSpec:
     openTypeCategories: dict[str, Literal["unassigned", "base", "mark", "ligature", "component"]]
 
 
+def readGlyphInventory(path: str | PathLike[str]) -> tuple[dict[int, str], list[str]]:
+    """
+    Read the cmap and glyph names of a UFO’s default layer, as taken by `MongFeaComposer`. Only `<unicode>` elements of glif files are scanned, without parsing outlines.
+    """
+
+    with UFOReader(path, validate=False) as reader:
+        glyphSet = reader.getGlyphSet()
+        glyphs = [*glyphSet.keys()]
+        unicodes = glyphSet.getUnicodes(glyphs)
+    return {j: i for i in glyphs for j in unicodes[i]}, glyphs
+
+
 def applySpecToFont(
     spec: FontSpec,
     font: Font,
     initPadding: float = 40,
     finaPadding: float = 100,
+    *,
+    lazy: bool = False,
 ) -> None:
-    """Default implementation for ufoLib2 Font."""
+    """
+    Default implementation for ufoLib2 Font.
 
+    With *lazy*, advance widths and unicodes of existing glyphs are read from the UFO the font was opened from, without loading glyphs, leaving outlines to be loaded when the font is saved or compiled. Glyphs changed in memory since the font was opened are then not taken into account.
+    """
+
+    reader = _DefaultLayerReader(font, lazy)
     skipExportGlyphs: list[str] = font.lib.get("public.skipExportGlyphs", [])
     existingCmap = {
-        j: i for i in font.keys() if i not in skipExportGlyphs for j in font[i].unicodes
+        j: i
+        for i, unicodes in reader.unicodes().items()
+        if i not in skipExportGlyphs
+        for j in unicodes
     }
 
     for name, glyphSpec in spec.newGlyphs.items():
@@ -38,7 +64,7 @@ def applySpecToFont(
             glyph.width += initPadding
         for baseGlyph in glyphSpec.components:
             glyph.components.append(Component(baseGlyph, Transform(dx=glyph.width)))
-            glyph.width += font[baseGlyph].width
+            glyph.width += reader.width(baseGlyph)
         if glyphSpec.finaPadding:
             glyph.width += finaPadding
 
@@ -48,3 +74,88 @@ def applySpecToFont(
         font[glyphName].unicode = codePoint
 
     font.lib.setdefault("public.openTypeCategories", {}).update(spec.openTypeCategories)
+
+
+def saveFontIncrementally(font: Font, path: str | PathLike[str]) -> None:
+    """
+    Save *font* to the UFO at *path*, only rewriting files whose content changed, e.g. glyphs created or changed by `applySpecToFont`, `features.fea` and `lib.plist`. Unchanged files keep their modification times.
+
+    Glyphs of a lazily opened font are compared with the existing output by their glif files in the source UFO, and only loaded if they differ. Layers only found in the existing output are removed.
+    """
+
+    if not (Path(path) / "metainfo.plist").is_file():
+        font.save(path, overwrite=True)
+        return
+
+    source = font.reader
+    sourceLayers = source.getLayerNames() if source else []
+    with UFOReader(path, validate=False) as reader:
+        existingLayers = reader.getLayerNames()
+        for layer in font.layers:  # Loads every layer, keeping glyphs lazy
+            if source is None or layer.name not in sourceLayers:
+                continue  # Every glyph in memory
+            sourceGlyphs = source.getGlyphSet(layer.name)
+            existing = reader.getGlyphSet(layer.name) if layer.name in existingLayers else None
+            for name in layer.keys():
+                if (
+                    existing is None
+                    or name not in existing
+                    or name not in sourceGlyphs
+                    or existing.getGLIF(name) != sourceGlyphs.getGLIF(name)
+                ):
+                    layer[name]  # Loaded if not yet, to be written
+    font.data.unlazify()
+    font.images.unlazify()
+
+    # In-place writing skips glyphs that are not loaded and compares the rest byte by byte. It
+    # also deletes layers and glyphs that only exist in the output:
+    with UFOWriter(path, validate=False) as writer:
+        font.write(writer, saveAs=False)
+
+
+class _DefaultLayerReader:
+    layer: Layer
+    glyphSet: GlyphSet | None
+    """Default layer of the UFO the font was opened from, to read glyphs without loading them."""
+    read: dict[str, "_GlyphMetrics"]
+    """Memoized widths and unicodes of glyphs read from `glyphSet`."""
+
+    def __init__(self, font: Font, lazy: bool) -> None:
+        self.layer = font.layers.defaultLayer
+        # Fonts not opened lazily from disk, which have every glyph in memory, are read as they are:
+        self.glyphSet = font.reader.getGlyphSet() if lazy and font.reader else None
+        self.read = {}
+
+    def width(self, name: str) -> float:
+        if self.glyphSet is not None and name in self.glyphSet:
+            return self.readMetrics(name).width
+        return self.layer[name].width
+
+    def unicodes(self) -> dict[str, list[int]]:
+        return {
+            i: (
+                self.readMetrics(i).unicodes
+                if self.glyphSet is not None and i in self.glyphSet
+                else self.layer[i].unicodes
+            )
+            for i in self.layer.keys()
+        }
+
+    def readMetrics(self, name: str) -> "_GlyphMetrics":
+        """Read the glif file of *name* without its outline."""
+
+        assert self.glyphSet is not None
+        if name not in self.read:
+            metrics = self.read[name] = _GlyphMetrics()
+            self.glyphSet.readGlyph(name, metrics)
+        return self.read[name]
+
+
+class _GlyphMetrics:
+    """Glyph object for `GlyphSet.readGlyph`, which skips attributes that cannot be set."""
+
+    __slots__ = ("width", "unicodes")
+
+    def __init__(self) -> None:
+        self.width: float = 0
+        self.unicodes: list[int] = []
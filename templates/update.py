@@ -6,7 +6,7 @@ from ufoLib2 import Font
 
 from mongfontbuilder.data.types import LocaleID
 from mongfontbuilder.otl import MongFeaComposer
-from mongfontbuilder.spec import applySpecToFont
+from mongfontbuilder.spec import applySpecToFont, readGlyphInventory
 
 templatesDir = Path(__file__).parent
 repo = templatesDir / ".."
@@ -36,19 +36,15 @@ def _build_template(
     glyphs_filename: str,
     family_name: str,
 ) -> None:
-    font = Font.open(repo / "tests" / ufo_name)
-    font._path = None  # glyphsLib expects str and may load from path
-
-    composer = MongFeaComposer(
-        cmap={j: i for i in font.keys() for j in font[i].unicodes},
-        glyphs=[*font.keys()],
-        locales=locales,
-    )
+    cmap, glyphs = readGlyphInventory(repo / "tests" / ufo_name)
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=locales)
     composer.languageSystems["mong"] = {"dflt"}
     spec = composer.compose()
     composer.languageSystems["DFLT"] = {"dflt"}
     fea = composer.asFeatureFile().asFea()
 
+    font = Font.open(repo / "tests" / ufo_name)
+    font._path = None  # glyphsLib expects str and may load from path
     applySpecToFont(  # Padding disturbs automatic alignment in Glyphs
         spec, font, initPadding=0, finaPadding=0
     )
@@ -7,6 +7,11 @@ def hudum_font():
     return buildFontForLocales(["MNG"])
 
 
+@pytest.fixture(scope="session")
+def hudum_compact_font():
+    return buildFontForLocales(["MNG"], compactGenderHarmony=True)
+
+
 @pytest.fixture(scope="session")
 def manchu_font():
     return buildFontForLocales(["MCH"])
@@ -1,20 +1,14 @@
 import csv
 from importlib.resources import files
-from os import environ
 from os.path import relpath
 from pathlib import Path
 
 import pytest
 from _pytest.mark.structures import ParameterSet
-from fontTools.ttLib import TTFont
-from ufo2ft import OTFCompiler
-from ufo2ft.constants import CFFOptimization
-from ufoLib2 import Font
 
 import data
 from mongfontbuilder.data.types import LocaleID
-from mongfontbuilder.otl import MongFeaComposer
-from mongfontbuilder.spec import applySpecToFont
+from mongfontbuilder.pipeline import composeFont, writeOutputs
 from utils import tempDir, testsDir
 
 FONT_NAME = {
@@ -24,41 +18,21 @@ FONT_NAME = {
 }
 
 
-def buildFontForLocales(locales: list[LocaleID]) -> Path:
+def buildFontForLocales(locales: list[LocaleID], compactGenderHarmony: bool = False) -> Path:
     fontName = FONT_NAME[locales[0].removesuffix("x")]
-    output = tempDir / f"{fontName}.otf"
+    outputName = fontName + ("-compact" if compactGenderHarmony else "")
+    output = tempDir / f"{outputName}.otf"
 
     if output.exists():
         return output
 
-    font = Font.open(testsDir / f"{fontName}.ufo")
-    c = MongFeaComposer(
-        cmap={j: i for i in font.keys() for j in font[i].unicodes},
-        glyphs=[*font.keys()],
-        locales=locales,
-    )
-    spec = c.compose()
-    applySpecToFont(spec, font)
-    font.features.text = c.asFeatureFile().asFea()
-
-    tempDir.mkdir(parents=True, exist_ok=True)
-    intermediate = tempDir / f"{fontName}.ufo"
-    font.save(intermediate, overwrite=True)
-
-    compileOTF(font).save(output)
+    font, _ = composeFont(testsDir / f"{fontName}.ufo", locales, compactGenderHarmony)
+    intermediate = tempDir / f"{outputName}.ufo"
+    writeOutputs(font, [intermediate, output])
     print(relpath(output))
     return output
 
 
-def compileOTF(font: Font) -> TTFont:
-    compiler = OTFCompiler(
-        useProductionNames=False,
-        optimizeCFF=CFFOptimization.NONE,
-    )
-    environ["FONTTOOLS_LOOKUP_DEBUGGING"] = "1"  # For feaLib.builder.Builder
-    return compiler.compile(font)
-
-
 def loadRawTestCases(
     test_info: dict[str, list[str]],
     font_type: str,
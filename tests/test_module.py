@@ -1,5 +1,29 @@
+import shutil
+import subprocess
+import sys
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+from ufo2ft.util import makeOfficialGlyphOrder
+from ufoLib2 import Font
+
+from mongfontbuilder.binary import applySpecToBinary, readBinaryInventory
+from mongfontbuilder.lookupcache import LookupCache, addOpenTypeFeaturesCached
 from mongfontbuilder.otl import MongFeaComposer
-from utils import tempDir
+from mongfontbuilder.otl.cache import composeCached
+from mongfontbuilder.otl.graph import LookupGraph
+from mongfontbuilder.otl.iib import LigaturePlanner
+from mongfontbuilder.otl.incremental import DataSnapshot, recompose
+from mongfontbuilder.otl.ordering import compareGlyphOrders
+from mongfontbuilder.otl.pruning import prune
+from mongfontbuilder.otl.subtables import splitSubtables
+from mongfontbuilder.pipeline import compileOTF, composeFont, writeOutputs
+from mongfontbuilder.shaping import shape
+from mongfontbuilder.spec import applySpecToFont, readGlyphInventory, saveFontIncrementally
+from utils import tempDir, testsDir
 
 
 def test_fea() -> None:
@@ -7,3 +31,301 @@ def test_fea() -> None:
     composer.compose()
     code = composer.asFeatureFile().asFea()
     (tempDir / "otl.fea").write_text(code)
+
+
+def test_glyph_inventory() -> None:
+    font = Font.open(testsDir / "manchu-ag.ufo")
+    cmap, glyphs = readGlyphInventory(testsDir / "manchu-ag.ufo")
+    assert glyphs == [*font.keys()]
+    assert cmap == {j: i for i in font.keys() for j in font[i].unicodes}
+
+
+def test_lazy_spec() -> None:
+    cmap, glyphs = readGlyphInventory(testsDir / "sibe.ufo")
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+    spec = composer.compose()
+    eager, lazy = Font.open(testsDir / "sibe.ufo"), Font.open(testsDir / "sibe.ufo")
+    applySpecToFont(spec, eager)
+    applySpecToFont(spec, lazy, lazy=True)
+    for glyph in eager:
+        assert lazy[glyph.name].width == glyph.width
+        assert lazy[glyph.name].unicodes == glyph.unicodes
+
+
+def test_incremental_save() -> None:
+    cmap, glyphs = readGlyphInventory(testsDir / "sibe.ufo")
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+    spec = composer.compose()
+    output = tempDir / "incremental.ufo"
+    shutil.rmtree(output, ignore_errors=True)
+
+    mtimes = list[dict[Path, int]]()
+    for width in [None, None, 100]:
+        font = Font.open(testsDir / "sibe.ufo")
+        applySpecToFont(spec, font, lazy=True)
+        if width is not None:
+            font[spec.cmap[0x1820]].width = width
+        saveFontIncrementally(font, output)
+        mtimes.append({i: i.stat().st_mtime_ns for i in output.rglob("*") if i.is_file()})
+
+    assert mtimes[1] == mtimes[0]
+    changed = [i for i, mtime in mtimes[2].items() if mtimes[1][i] != mtime]
+    assert [i.name for i in changed] == ["u1820.glif"]
+    assert Font.open(output)[spec.cmap[0x1820]].width == 100
+
+    stale = Font.open(output, lazy=False)
+    stale.layers.newLayer("stale").newGlyph("a")
+    stale.save()
+    font = Font.open(testsDir / "sibe.ufo")
+    applySpecToFont(spec, font, lazy=True)
+    saveFontIncrementally(font, output)
+    assert Font.open(output).layers.layerOrder == font.layers.layerOrder
+    assert not (output / "glyphs.stale").exists()
+
+
+def test_unsupported_output() -> None:
+    with pytest.raises(ValueError):
+        writeOutputs(Font(), [tempDir / "font.ttf"])
+
+
+def test_several_ufo_outputs() -> None:
+    font, _ = composeFont(testsDir / "sibe.ufo", ["SIB"])
+    outputs = [tempDir / "sibe-1.ufo", tempDir / "sibe-2.ufo"]
+    writeOutputs(font, outputs)
+    first, second = [Font.open(i) for i in outputs]
+    assert first.keys() == second.keys() == font.keys()
+    for name in font.keys():
+        assert first[name].width == second[name].width == font[name].width
+
+
+def test_cli_manchu_ali_gali() -> None:
+    output = tempDir / "manchu-ag.otf"
+    subprocess.run(
+        [sys.executable, "-m", "mongfontbuilder", testsDir / "manchu-ag.ufo", output]
+        + ["--locales", "MCH", "MCHx"],
+        check=True,
+    )
+    # Medial g selected by FVS3, also the second variant with the masculine onset condition:
+    assert shape(output, "\u1820\u1864\u180d\u1820")[1] == "u1864.Hh2.medi"
+    assert shape(output, "\u1820\u1864\u1820")[1] == "u1864.Hh.medi"
+
+
+def test_binary_patch(sibe_font: Path) -> None:
+    ttFont = compileOTF(Font.open(testsDir / "sibe.ufo"))
+    cmap, glyphs = readBinaryInventory(ttFont)
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+    spec = composer.compose()
+    applySpecToBinary(spec, ttFont, composer.asFeatureFile().asFea())
+    output = tempDir / "sibe-patched.otf"
+    ttFont.save(output)
+
+    expected = TTFont(sibe_font)
+    patched = TTFont(output)
+    assert patched.getBestCmap() == expected.getBestCmap()
+    for name in expected.getGlyphOrder():
+        assert patched["hmtx"][name] == expected["hmtx"][name]
+
+    for text in ["\u1830\u1822\u182a\u1821", "\u1820\u180c\u1828", "\u1828\u1822"]:
+        assert shape(output, text) == shape(sibe_font, text)
+
+
+def test_cli_binary_suffix(sibe_font: Path) -> None:
+    command = [sys.executable, "-m", "mongfontbuilder", sibe_font, tempDir / "sibe.ttf"]
+    result = subprocess.run(command + ["--locales", "SIB"], capture_output=True, text=True)
+    assert result.returncode == 2 and "CFF outlines" in result.stderr
+
+
+def test_binary_patch_keeps_gdef() -> None:
+    font = Font.open(testsDir / "sibe.ufo")
+    font.features.text = """
+        lookup kerning {
+            lookupflag UseMarkFilteringSet [fvs2];
+            pos _A.init 10;
+        } kerning;
+        feature kern { lookup kerning; } kern;
+        table GDEF { LigatureCaretByPos _A.init 100; } GDEF;
+    """
+    ttFont = compileOTF(font)
+    cmap, glyphs = readBinaryInventory(ttFont)
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+    applySpecToBinary(composer.compose(), ttFont, composer.asFeatureFile().asFea())
+
+    gdef = ttFont["GDEF"].table
+    assert gdef.LigCaretList.Coverage.glyphs == ["_A.init"]
+    gpos = ttFont["GPOS"].table.LookupList.Lookup[0]
+    assert gdef.MarkGlyphSetsDef.Coverage[gpos.MarkFilteringSet].glyphs == ["fvs2"]
+    gsub = [i for i in ttFont["GSUB"].table.LookupList.Lookup if i.LookupFlag & 0x0010]
+    assert gsub and all(i.MarkFilteringSet > 0 for i in gsub)
+
+
+def test_composition_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    cmap, glyphs = readGlyphInventory(testsDir / "sibe.ufo")
+    cacheDir = tempDir / "composition"
+    shutil.rmtree(cacheDir, ignore_errors=True)
+    spec, fea = composeCached(cmap, glyphs, ["SIB"], cacheDir)
+
+    def compose(self: MongFeaComposer) -> None:
+        raise AssertionError("not cached")
+
+    monkeypatch.setattr(MongFeaComposer, "compose", compose)
+    assert composeCached(cmap, glyphs, ["SIB"], cacheDir) == (spec, fea)
+    with pytest.raises(AssertionError):
+        composeCached(cmap, glyphs[1:], ["SIB"], cacheDir)
+
+
+def test_lookup_cache() -> None:
+    cmap, glyphs = readGlyphInventory(testsDir / "sibe.ufo")
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+    spec = composer.compose()
+    fea = composer.asFeatureFile().asFea()
+    cachePath = tempDir / "lookups.json"
+    cachePath.unlink(missing_ok=True)
+
+    def build(cache: LookupCache | None) -> bytes:
+        font = TTFont()
+        font.setGlyphOrder([*glyphs, *spec.newGlyphs])
+        if cache is None:
+            addOpenTypeFeaturesFromString(font, fea, tables=["GSUB"])
+        else:
+            addOpenTypeFeaturesCached(font, fea, cache, tables=["GSUB"])
+        return font.getTableData("GSUB")
+
+    cache = LookupCache(cachePath)
+    expected = build(cache)
+    assert cache.hits == 0 and cache.misses
+    cache.save()
+
+    cache = LookupCache(cachePath)
+    assert build(cache) == expected == build(None)
+    assert cache.hits and cache.misses == 0
+
+    # Includes are resolved relative to the feature file name:
+    (tempDir / "lookups.fea").write_text(fea)
+    font = TTFont()
+    font.setGlyphOrder([*glyphs, *spec.newGlyphs])
+    filename = str(tempDir / "features.fea")
+    addOpenTypeFeaturesCached(font, "include(lookups.fea);", cache, filename, tables=["GSUB"])
+    assert font.getTableData("GSUB") == expected
+
+
+def test_recompose() -> None:
+    cmap, glyphs = readGlyphInventory(testsDir / "sibe.ufo")
+    old = DataSnapshot.current()
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+    composer.compose()
+
+    new = deepcopy(old)
+    new.variants["MONGOLIAN LETTER A"]["init"][2].locales["SIB"].conditions.append("marked")
+    new.particles["SIB"]["mvs e"] = [1]
+    del new.ligatures["optional"]["BL"]
+    try:
+        result = recompose(composer, old, new)
+        assert not result.rebuilt
+        assert result.regenerated == ["SIB:marked", "IIb.ligature", "III.particle.SIB"]
+        expected = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["SIB"])
+        spec = expected.compose()
+        assert result.composer.spec == spec
+        assert [*result.composer.spec.newGlyphs] == [*spec.newGlyphs]
+        assert result.composer.asFeatureFile().asFea() == expected.asFeatureFile().asFea()
+
+        del new.variants["MONGOLIAN LETTER A"]["init"][1]
+        assert recompose(result.composer, DataSnapshot.current(), new).rebuilt
+    finally:
+        old.install()
+
+
+def test_ligature_planner() -> None:
+    cmap, glyphs = readGlyphInventory(testsDir / "hudum.ufo")
+    glyphs = [i for i in glyphs if not i.startswith("_B")]
+    composer = MongFeaComposer(cmap=cmap, glyphs=glyphs, locales=["MNG"])
+    composer.compose()
+    planner = LigaturePlanner.fromComposer(composer)
+    unfiltered = LigaturePlanner(composer, None)
+    for writtens in ["BA", "BE", "GA"]:
+        expected = [
+            (input, ligature)
+            for input, ligature in unfiltered.substitutions(writtens, "init", "MNG")
+            if str(ligature) in glyphs
+            or f"_{''.join(ligature.units)}.{ligature.position}" in glyphs
+        ]
+        assert [*planner.substitutions(writtens, "init", "MNG")] == expected
+    assert planner.report.missingGlyphs
+
+    report = composer.ligatureReport
+    assert report and report.missingGlyphs and report.notVowel
+    assert report.candidates == sum(
+        [report.missingGlyphs, report.notVowel, report.duplicates, report.rules]
+    )
+
+
+def test_lookup_graph() -> None:
+    composer = MongFeaComposer(cmap={}, glyphs=[], locales=["MCH", "MCHx"])
+    composer.compose()
+    graph = LookupGraph.fromStatements(composer.root)
+    assert not graph.unreachable()
+    assert "MCHx:masculine_devsger" not in graph.references
+    assert "MCH:feminine" in graph.reachable()
+
+
+def test_mark_filtering_sets() -> None:
+    composer = MongFeaComposer(cmap={}, glyphs=[], locales=["MNG"])
+    composer.compose()
+    used = composer.usedMarkFilteringSets()
+    contents = [frozenset(i.glyphs.asFea().strip("[]").split()) for i in used]
+    assert len({*contents}) == len(used) > 1
+    assert composer.classes["fvs"] in used
+
+
+def test_prune() -> None:
+    font = Font.open(testsDir / "hudum.ufo")
+    glyphs = [i for i in font.keys() if not i.startswith(("_K", "_G"))]
+    composer = MongFeaComposer(
+        cmap={j: i for i in glyphs for j in font[i].unicodes},
+        glyphs=glyphs,
+        locales=["MNG"],
+    )
+    spec = composer.compose()
+    report = prune(composer)
+    assert report.glyphs and report.rules
+    assert not {*report.glyphs}.intersection(spec.newGlyphs)
+
+    ttFont = TTFont()
+    ttFont.setGlyphOrder([".notdef", *glyphs, *spec.newGlyphs])
+    addOpenTypeFeaturesFromString(ttFont, composer.asFeatureFile().asFea())
+
+
+def test_split_subtables() -> None:
+    font = Font.open(testsDir / "hudum.ufo")
+    glyphs = [*font.keys()]
+    composer = MongFeaComposer(
+        cmap={j: i for i in glyphs for j in font[i].unicodes},
+        glyphs=glyphs,
+        locales=["MNG"],
+    )
+    spec = composer.compose()
+    assert not composer.oversizedLookups
+
+    oversized = splitSubtables(composer, budget=0x100)
+    assert oversized
+    code = composer.asFeatureFile().asFea()
+    assert "subtable;" in code and "useExtension" in code
+
+    ttFont = TTFont()
+    ttFont.setGlyphOrder([".notdef", *glyphs, *spec.newGlyphs])
+    addOpenTypeFeaturesFromString(ttFont, code)
+
+
+def test_glyph_order() -> None:
+    font = Font.open(testsDir / "sibe.ufo")
+    composer = MongFeaComposer(
+        cmap={j: i for i in font.keys() for j in font[i].unicodes},
+        glyphs=[*font.keys()],
+        locales=["SIB"],
+    )
+    applySpecToFont(composer.compose(), font)
+    glyphOrder = makeOfficialGlyphOrder(font)
+    optimized, report = compareGlyphOrders(
+        composer, glyphOrder, font.lib["public.openTypeCategories"]
+    )
+    assert sorted(optimized) == sorted(glyphOrder)
+    assert report.after["GSUB"] < report.before["GSUB"]
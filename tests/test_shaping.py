@@ -1,8 +1,10 @@
 from pathlib import Path
 
 import pytest
+from _pytest.mark.structures import ParameterSet
 
 from fixtures import loadRawTestCases
+from mongfontbuilder.shaping import diffShaping
 from utils import parseAliases, parseLetter, parseWrittenUnits
 
 
@@ -17,6 +19,14 @@ def test_MNG(index: str, letters: str, locale: str, goal: str, hudum_font: Path)
     assert result == goal, f"ind:  {index}\ncode: {codes}\nres:  {result}\ngoal: {goal}"
 
 
+def test_MNG_compact_gender_harmony(hudum_font: Path, hudum_compact_font: Path) -> None:
+    texts = list[str]()
+    for case in loadRawTestCases({"eac": ["hud"], "core": ["hud"]}, "MNG"):
+        _, letters, locale, _ = case.values if isinstance(case, ParameterSet) else case
+        texts.append(parseLetter(letters, locale))  # type: ignore
+    assert not diffShaping(hudum_font, hudum_compact_font, texts, jobs=1)
+
+
 @pytest.mark.parametrize(
     ("index", "letters", "locale", "goal"),
     loadRawTestCases({"core": ["man"]}, "MCH"),
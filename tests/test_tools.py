@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from mongfontbuilder.shaping import diffShaping, profileLookups
+
+texts = ["ᠮᠣᠩᠭᠣᠯ", "ᠪᠢᠴᠢᠭ", "ᠭᠡᠷ", "ᠠ ᠡ ᠢ"]
+
+
+def test_diff_identical(hudum_font: Path, tmp_path: Path) -> None:
+    assert diffShaping(hudum_font, hudum_font, texts, jobs=1, cacheDir=tmp_path) == []
+    assert [*tmp_path.iterdir()]
+
+
+def test_diff_early_exit(hudum_font: Path, manchu_font: Path) -> None:
+    differences = diffShaping(hudum_font, manchu_font, texts, jobs=2)
+    assert differences
+    assert len(diffShaping(hudum_font, manchu_font, texts, jobs=1, maxDifferences=1)) == 1
+
+
+def test_profile(hudum_font: Path) -> None:
+    profiles = {i.name: i for i in profileLookups(hudum_font, texts, jobs=1)}
+    assert profiles["IIa.init"].applied >= profiles["IIa.init"].changed > 0
+    assert profiles["_.ignored"].nested
+    assert profiles["MNG:chachlag"].applied == 0
+
+
+def test_diff_early_exit_parallel(hudum_font: Path, manchu_font: Path) -> None:
+    # Several chunks of distinct strings, so that several workers finish before stopping:
+    corpus = [f"{i} {j}" for i in texts for j in range(1000)]
+    assert len(diffShaping(hudum_font, manchu_font, corpus, jobs=4, maxDifferences=3)) == 3